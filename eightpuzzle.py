@@ -13,7 +13,24 @@
 
 
 import search
+import util
 import random
+import os
+import sys
+import time
+
+# Directory the pattern databases are saved in once they have been built
+PATTERN_DATABASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.pattern_databases')
+
+# Bumped whenever the way the databases are built changes, so that files
+# saved by an older version are not read back
+PATTERN_DATABASE_VERSION = 2
+
+# Disjoint groups of tiles with one pattern database each, by puzzle size.
+# Only moves of a group's own tiles are counted, so the databases add up to
+# an admissible heuristic.
+PATTERN_GROUPS = {3: [(1, 2, 3, 4), (5, 6, 7, 8)],
+                  4: [(1, 2, 3, 6, 7), (4, 5, 8, 9, 12), (10, 11, 13, 14, 15)]}
 
 # Module Classes
 
@@ -25,6 +42,10 @@ class EightPuzzleState:
     This class defines the mechanics of the puzzle itself.  The
     task of recasting this puzzle as a search problem is left to
     the EightPuzzleSearchProblem class.
+
+    Any square sliding puzzle works the same way, so the class also
+    holds the Fifteen Puzzle: its size is taken from the number of
+    tiles it is built from.
     """
 
     def __init__( self, numbers ):
@@ -47,14 +68,18 @@ class EightPuzzleState:
             ------------
 
         The configuration of the puzzle is stored in a 2-dimensional
-        list (a list of lists) 'cells'.
+        list (a list of lists) 'cells'.  A list of the 16 numbers from 0
+        to 15 makes a Fifteen Puzzle in the same way.
         """
+        self.size = int(round(len(numbers) ** 0.5))
+        if self.size * self.size != len(numbers):
+            raise ValueError, 'a sliding puzzle needs a square number of tiles, not %d' % len(numbers)
         self.cells = []
         numbers = numbers[:] # Make a copy so as not to cause side-effects.
         numbers.reverse()
-        for row in range( 3 ):
+        for row in range( self.size ):
             self.cells.append( [] )
-            for col in range( 3 ):
+            for col in range( self.size ):
                 self.cells[row].append( numbers.pop() )
                 if self.cells[row][col] == 0:
                     self.blankLocation = row, col
@@ -78,8 +103,8 @@ class EightPuzzleState:
         False
         """
         current = 0
-        for row in range( 3 ):
-            for col in range( 3 ):
+        for row in range( self.size ):
+            for col in range( self.size ):
                 if current != self.cells[row][col]:
                     return False
                 current += 1
@@ -99,14 +124,30 @@ class EightPuzzleState:
         row, col = self.blankLocation
         if(row != 0):
             moves.append('up')
-        if(row != 2):
+        if(row != self.size - 1):
             moves.append('down')
         if(col != 0):
             moves.append('left')
-        if(col != 2):
+        if(col != self.size - 1):
             moves.append('right')
         return moves
 
+    def tilePositions( self ):
+        """
+          Returns a list holding, for each tile number, the index of the
+        cell it is in, counting along the rows from the top left.
+
+        >>> EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).tilePositions()
+        [1, 0, 2, 3, 4, 5, 6, 7, 8]
+        """
+        positions = [0] * (self.size * self.size)
+        cell = 0
+        for values in self.cells:
+            for tile in values:
+                positions[tile] = cell
+                cell += 1
+        return positions
+
     def result(self, move):
         """
           Returns a new eightPuzzle with the current state and blankLocation
@@ -136,7 +177,7 @@ class EightPuzzleState:
             raise "Illegal Move"
 
         # Create a copy of the current eightPuzzle
-        newPuzzle = EightPuzzleState([0, 0, 0, 0, 0, 0, 0, 0, 0])
+        newPuzzle = EightPuzzleState([0] * (self.size * self.size))
         newPuzzle.cells = [values[:] for values in self.cells]
         # And update it to reflect the move
         newPuzzle.cells[row][col] = self.cells[newrow][newcol]
@@ -155,7 +196,7 @@ class EightPuzzleState:
               EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).result('left')
           True
         """
-        for row in range( 3 ):
+        for row in range( self.size ):
             if self.cells[row] != other.cells[row]:
                 return False
         return True
@@ -168,14 +209,16 @@ class EightPuzzleState:
           Returns a display string for the maze
         """
         lines = []
-        horizontalLine = ('-' * (13))
+        # Wide enough for the largest tile number
+        width = len(str(self.size * self.size - 1))
+        horizontalLine = ('-' * (self.size * (width + 3) + 1))
         lines.append(horizontalLine)
         for row in self.cells:
             rowLine = '|'
             for col in row:
                 if col == 0:
                     col = ' '
-                rowLine = rowLine + ' ' + col.__str__() + ' |'
+                rowLine = rowLine + ' ' + col.__str__().rjust(width) + ' |'
             lines.append(rowLine)
             lines.append(horizontalLine)
         return '\n'.join(lines)
@@ -183,20 +226,171 @@ class EightPuzzleState:
     def __str__(self):
         return self.__getAsciiString()
 
+    def pack(self):
+        "Returns the same puzzle as a PackedPuzzleState"
+        numbers = []
+        for values in self.cells:
+            numbers.extend(values)
+        return PackedPuzzleState(numbers)
+
+# Move tables for PackedPuzzleState, by puzzle size
+PUZZLE_MOVE_TABLES = {}
+
+def getMoveTables(size):
+    """
+      Returns the move tables for size x size puzzles: for each cell of the
+    blank, the list of its legal moves and a dictionary from each of those
+    moves to the cell the blank ends up in.  The packed goal comes third.
+    """
+    tables = PUZZLE_MOVE_TABLES.get(size)
+    if tables is not None:
+        return tables
+    legal = []
+    targets = []
+    for blank in range(size * size):
+        row, col = divmod(blank, size)
+        moves = []
+        cells = {}
+        for move, ok, offset in [('up', row != 0, -size), ('down', row != size - 1, size),
+                                 ('left', col != 0, -1), ('right', col != size - 1, 1)]:
+            if ok:
+                moves.append(move)
+                cells[move] = blank + offset
+        legal.append(moves)
+        targets.append(cells)
+    goal = 0
+    for cell in range(size * size - 1, -1, -1):
+        goal = (goal << 4) | cell
+    tables = (legal, targets, goal)
+    PUZZLE_MOVE_TABLES[size] = tables
+    return tables
+
+class PackedPuzzleState:
+    """
+      A sliding puzzle packed into a single integer, for searches that make
+    many states.  Cell i (counting along the rows from the top left) holds
+    its tile in bits 4i to 4i+3, so puzzles up to the Fifteen Puzzle fit,
+    and the cell of the blank is kept alongside.  Two states are equal when
+    their integers are, and the integer is the hash.
+
+    Legal moves and results come straight from the tables of getMoveTables:
+    a move swaps the blank with one tile, which is one shift and two
+    additions on the integer.  It offers the same methods as
+    EightPuzzleState, and unpack() and pack() convert between the two;
+    printing goes through unpack().
+
+    >>> print PackedPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).result('left')
+    -------------
+    |   | 1 | 2 |
+    -------------
+    | 3 | 4 | 5 |
+    -------------
+    | 6 | 7 | 8 |
+    -------------
+    """
+    def __init__(self, numbers=None, packed=0, blank=0, size=3):
+        """
+          Packs a list of numbers, ordered as for EightPuzzleState.  result()
+        leaves numbers out and passes the integer, blank cell and size in
+        directly instead.
+        """
+        if numbers is not None:
+            size = int(round(len(numbers) ** 0.5))
+            if size * size != len(numbers) or size > 4:
+                raise ValueError, 'cannot pack a puzzle of %d tiles' % len(numbers)
+            packed = 0
+            for cell in range(len(numbers) - 1, -1, -1):
+                packed = (packed << 4) | numbers[cell]
+                if numbers[cell] == 0:
+                    blank = cell
+        self.packed = packed
+        self.blank = blank
+        self.size = size
+
+    def isGoal( self ):
+        """
+          Checks to see if the puzzle is in its goal state: tile i in cell i.
+
+        >>> PackedPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8]).isGoal()
+        True
+        """
+        return self.packed == getMoveTables(self.size)[2]
+
+    def legalMoves( self ):
+        """
+          Returns a list of legal moves from the current state, as
+        EightPuzzleState.legalMoves does.
+
+        >>> PackedPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8]).legalMoves()
+        ['down', 'right']
+        """
+        return getMoveTables(self.size)[0][self.blank][:]
+
+    def result(self, move):
+        """
+          Returns a new PackedPuzzleState with the blank moved.  The current
+        state is not changed.
+        """
+        target = getMoveTables(self.size)[1][self.blank].get(move)
+        if target is None:
+            raise ValueError, 'illegal move %s with the blank in cell %d' % (move, self.blank)
+        # The tile in the target cell slides into the blank's cell
+        tile = (self.packed >> (4 * target)) & 15
+        packed = self.packed - (tile << (4 * target)) + (tile << (4 * self.blank))
+        return PackedPuzzleState(None, packed, target, self.size)
+
+    def tilePositions( self ):
+        "Returns a list holding, for each tile number, the index of the cell it is in"
+        positions = [0] * (self.size * self.size)
+        packed = self.packed
+        for cell in range(len(positions)):
+            positions[packed & 15] = cell
+            packed >>= 4
+        return positions
+
+    def getNumbers( self ):
+        "Returns the tiles cell by cell, as EightPuzzleState takes them"
+        numbers = []
+        packed = self.packed
+        for cell in range(self.size * self.size):
+            numbers.append(packed & 15)
+            packed >>= 4
+        return numbers
+
+    def unpack(self):
+        "Returns the same puzzle as an EightPuzzleState"
+        return EightPuzzleState(self.getNumbers())
+
+    def pack(self):
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, PackedPuzzleState) and self.packed == other.packed
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.packed)
+
+    def __str__(self):
+        return str(self.unpack())
+
 # TODO: Implement The methods in this class
 
 class EightPuzzleSearchProblem(search.SearchProblem):
     """
       Implementation of a SearchProblem for the  Eight Puzzle domain
 
-      Each state is represented by an instance of an eightPuzzle.
+      Each state is represented by an instance of an eightPuzzle, or of
+      a PackedPuzzleState if the puzzle it starts from is packed.
     """
     def __init__(self,puzzle):
         "Creates a new EightPuzzleSearchProblem which stores search information."
         self.puzzle = puzzle
 
     def getStartState(self):
-        return puzzle
+        return self.puzzle
 
     def isGoalState(self,state):
         return state.isGoal()
@@ -221,6 +415,175 @@ class EightPuzzleSearchProblem(search.SearchProblem):
         """
         return len(actions)
 
+class PatternDatabase:
+    """
+      A lower bound on the number of moves of a group of tiles that it takes
+    to bring them from any placement to their goal cells.
+
+    Only the tiles of the group are modelled: the blank and the other tiles
+    are ignored, and a tile of the group may slide into any neighbouring cell
+    that no other tile of the group is in (Korf and Felner's additive pattern
+    databases).  Every real move of one of the group's tiles is such a
+    slide, and every other real move leaves the placement alone, so one move
+    changes an entry by at most one and the heuristic stays consistent.
+
+    The table holds one byte per placement of the group, indexed by the cells
+    of its tiles read as the digits of a number in base size*size (so some
+    entries, where two tiles would share a cell, are never used).  It is
+    filled by a breadth first search backwards from the goal.
+    """
+    UNSEEN = 255
+
+    def __init__(self, size, tiles, table=None):
+        self.size = size
+        self.tiles = tuple(tiles)
+        if table is None:
+            table = self._build()
+        self.table = table
+
+    def _build(self):
+        cellCount = self.size * self.size
+        count = len(self.tiles)
+        neighbours = [[] for cell in range(cellCount)]
+        for cell in range(cellCount):
+            row, col = divmod(cell, self.size)
+            if row > 0:
+                neighbours[cell].append(cell - self.size)
+            if row < self.size - 1:
+                neighbours[cell].append(cell + self.size)
+            if col > 0:
+                neighbours[cell].append(cell - 1)
+            if col < self.size - 1:
+                neighbours[cell].append(cell + 1)
+        # How much the index changes when each tile moves over by one cell
+        weights = [cellCount ** (count - 1 - i) for i in range(count)]
+        table = bytearray([self.UNSEEN]) * (cellCount ** count)
+        # In the goal every tile sits on the cell with its number
+        goal = 0
+        for tile in self.tiles:
+            goal = goal * cellCount + tile
+        table[goal] = 0
+        layer = [goal]
+        moves = 0
+        while layer:
+            moves += 1
+            nextLayer = []
+            for index in layer:
+                # The cell of each of the group's tiles, and which cells they fill
+                cells = [0] * count
+                occupied = [False] * cellCount
+                rest = index
+                for i in range(count - 1, -1, -1):
+                    rest, cell = divmod(rest, cellCount)
+                    cells[i] = cell
+                    occupied[cell] = True
+                for i in range(count):
+                    cell = cells[i]
+                    for neighbour in neighbours[cell]:
+                        if not occupied[neighbour]:
+                            nextIndex = index + (neighbour - cell) * weights[i]
+                            if table[nextIndex] == self.UNSEEN:
+                                table[nextIndex] = moves
+                                nextLayer.append(nextIndex)
+            layer = nextLayer
+        return table
+
+    def getMoves(self, positions):
+        "Returns the number of moves the group needs, given the cell of each tile (see tilePositions)"
+        cellCount = self.size * self.size
+        index = 0
+        for tile in self.tiles:
+            index = index * cellCount + positions[tile]
+        return self.table[index]
+
+    def save(self, path):
+        "Saves the move counts to path, one byte per pattern"
+        util.writeFileAtomically(path, lambda out: out.write(self.table))
+
+    def load(size, tiles, path):
+        "Returns the PatternDatabase saved at path, or None if the file is missing or the wrong size"
+        try:
+            source = open(path, 'rb')
+            try:
+                table = bytearray(source.read())
+            finally:
+                source.close()
+        except (IOError, OSError):
+            return None
+        if len(table) != (size * size) ** len(tiles):
+            return None
+        return PatternDatabase(size, tiles, table)
+    load = staticmethod(load)
+
+# Pattern databases this process has loaded or built, by puzzle size
+PATTERN_DATABASES = {}
+
+def getPatternDatabases(size):
+    """
+      Returns the pattern databases for the tile groups in PATTERN_GROUPS[size].
+    They are read from PATTERN_DATABASE_DIR the first time they are asked
+    for, and only built (and saved there) if they are not on disk yet.
+    """
+    databases = PATTERN_DATABASES.get(size)
+    if databases is not None:
+        return databases
+    if size not in PATTERN_GROUPS:
+        raise ValueError, 'no pattern groups are set up for puzzles of size %d' % size
+    databases = []
+    for tiles in PATTERN_GROUPS[size]:
+        path = None
+        database = None
+        if PATTERN_DATABASE_DIR is not None:
+            name = 'size%d-%s.v%d.pdb' % (size, '-'.join([str(tile) for tile in tiles]), PATTERN_DATABASE_VERSION)
+            path = os.path.join(PATTERN_DATABASE_DIR, name)
+            database = PatternDatabase.load(size, tiles, path)
+        if database is None:
+            database = PatternDatabase(size, tiles)
+            if path is not None:
+                util.saveCacheFile(path, database.save)
+        databases.append(database)
+    PATTERN_DATABASES[size] = databases
+    return databases
+
+# Cell each cell is mirrored to across the main diagonal, by puzzle size
+TRANSPOSED_CELLS = {}
+
+def transposeCells(size):
+    "Returns the cell each cell is mirrored to across the main diagonal"
+    transpose = TRANSPOSED_CELLS.get(size)
+    if transpose is None:
+        transpose = [(cell % size) * size + cell // size for cell in range(size * size)]
+        TRANSPOSED_CELLS[size] = transpose
+    return transpose
+
+def patternDatabaseHeuristic(state, problem=None):
+    """
+      Additive pattern database heuristic for a sliding puzzle: the sum of the
+    moves each group of tiles needs on its own.  The groups share no tiles and
+    none counts moves of the blank, so the sum never overestimates, and a
+    move changes it by at most one, so it is consistent as well.
+
+    The goal is its own mirror image across the main diagonal once the tile
+    numbers are mirrored too, so the mirrored puzzle takes exactly as many
+    moves to solve.  Looking it up in the same databases gives a second
+    estimate for free, and the larger of the two is used.
+
+    >>> patternDatabaseHeuristic(EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]))
+    1
+    """
+    databases = getPatternDatabases(state.size)
+    positions = state.tilePositions()
+    transpose = transposeCells(state.size)
+    mirrored = [0] * len(positions)
+    for tile in range(len(positions)):
+        mirrored[transpose[tile]] = transpose[positions[tile]]
+    total = 0
+    mirroredTotal = 0
+    for database in databases:
+        total += database.getMoves(positions)
+        mirroredTotal += database.getMoves(mirrored)
+    return max(total, mirroredTotal)
+
 EIGHT_PUZZLE_DATA = [[1, 0, 2, 3, 4, 5, 6, 7, 8],
                      [1, 7, 8, 2, 3, 4, 5, 6, 0],
                      [4, 3, 2, 7, 0, 5, 1, 6, 8],
@@ -248,6 +611,10 @@ def loadEightPuzzle(puzzleNumber):
     """
     return EightPuzzleState(EIGHT_PUZZLE_DATA[puzzleNumber])
 
+def loadPackedEightPuzzle(puzzleNumber):
+    "Returns puzzle puzzleNumber of EIGHT_PUZZLE_DATA as a PackedPuzzleState"
+    return loadEightPuzzle(puzzleNumber).pack()
+
 def createRandomEightPuzzle(moves=100):
     """
       moves: number of random moves to apply
@@ -256,13 +623,65 @@ def createRandomEightPuzzle(moves=100):
       a series of 'moves' random moves to a solved
       puzzle.
     """
-    puzzle = EightPuzzleState([0,1,2,3,4,5,6,7,8])
+    return createRandomPuzzle(3, moves)
+
+def createRandomFifteenPuzzle(moves=100):
+    """
+      moves: number of random moves to apply
+
+      Creates a random fifteen puzzle in the same way.
+    """
+    return createRandomPuzzle(4, moves)
+
+def createRandomPuzzle(size, moves=100):
+    "Applies 'moves' random moves to the solved size x size puzzle"
+    puzzle = EightPuzzleState(range(size * size))
     for i in range(moves):
         # Execute a random legal move
         puzzle = puzzle.result(random.sample(puzzle.legalMoves(), 1)[0])
     return puzzle
 
+def benchmarkPatternDatabases(fifteenPuzzles=5, moves=100):
+    """
+      Solves every puzzle in EIGHT_PUZZLE_DATA with breadth first search and
+    with A* using patternDatabaseHeuristic, then a few random fifteen
+    puzzles with A* alone, and prints the path length, expanded nodes and
+    time of each search.  Every search is run on EightPuzzleStates and
+    again on PackedPuzzleStates.
+    """
+    start = time.time()
+    for size in PATTERN_GROUPS:
+        getPatternDatabases(size)
+    print('Pattern databases ready in %.2fs' % (time.time() - start))
+
+    def run(puzzle, searchFunction, *args):
+        problem = EightPuzzleSearchProblem(puzzle)
+        stats = search.SearchStatistics()
+        stats.attach(problem)
+        start = time.time()
+        path = searchFunction(problem, *args)
+        return len(path), stats.expanded, time.time() - start
+
+    print('%-8s %22s %22s %8s %8s' % ('puzzle', 'bfs moves/expanded/s', 'pdb moves/expanded/s',
+                                       'packed', 'packed'))
+    for number in range(len(EIGHT_PUZZLE_DATA)):
+        puzzle = loadEightPuzzle(number)
+        bfs = run(puzzle, search.breadthFirstSearch)
+        pdb = run(puzzle, search.aStarSearch, patternDatabaseHeuristic)
+        packedBfs = run(puzzle.pack(), search.breadthFirstSearch)
+        packedPdb = run(puzzle.pack(), search.aStarSearch, patternDatabaseHeuristic)
+        print('%-8d %5d %8d %7.3f %5d %8d %7.3f %7.3fs %7.3fs' %
+              ((number,) + bfs + pdb + (packedBfs[2], packedPdb[2])))
+    for number in range(fifteenPuzzles):
+        puzzle = createRandomFifteenPuzzle(moves)
+        pdb = run(puzzle, search.aStarSearch, patternDatabaseHeuristic)
+        packed = run(puzzle.pack(), search.aStarSearch, patternDatabaseHeuristic)
+        print('15-puzzle %d: %d moves, %d expanded, %.3fs (packed %.3fs)' % ((number,) + pdb + packed[2:]))
+
 if __name__ == '__main__':
+    if sys.argv[1:] == ['--benchmark']:
+        benchmarkPatternDatabases()
+        sys.exit(0)
     puzzle = createRandomEightPuzzle(25)
     print('A random puzzle:')
     print(puzzle)
@@ -0,0 +1,940 @@
+# mazeGraph.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Precomputed distance information about a maze, shared by the heuristics and
+agents in searchAgents.py so that they do not have to run a fresh search for
+every pair of points they care about.
+
+A DistanceField makes one pass over the walls Grid from a source cell (or
+from several at once) and records, for every cell it reaches, the distance
+to the nearest source and the moves that lead along a shortest path:
+
+> field = DistanceField(gameState.getWalls(), [gameState.getPacmanPosition()])
+> field.getDistance((1, 1))      # maze distance from Pacman to (1, 1)
+> field.pathFromSource((1, 1))   # the actions that walk it
+
+Cells are numbered x * height + y, the same order Grid stores them in, and
+the results are kept in flat arrays indexed by that number.
+
+A DistanceTable holds the maze distance between every pair of open cells of
+a layout.  It is built once per layout and saved under DISTANCE_CACHE_DIR, so
+later processes memory-map the file instead of rebuilding it:
+
+> table = getDistanceTable(gameState.data.layout)
+> table.getDistance((2, 4), (5, 6))
+
+The table grows with the square of the number of open cells, so
+getMazeDistance only builds it for layouts of up to DISTANCE_TABLE_MAX_CELLS
+open cells and answers queries on larger ones from a few cached
+DistanceFields instead.
+"""
+
+from game import Directions
+from game import Actions
+import array
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import sys
+import util
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Where distance tables are saved between runs; None keeps them in memory only
+DISTANCE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.distance_cache')
+# Tables built or loaded in this process, keyed by the hash of the layout text
+DISTANCE_TABLE_CACHE = {}
+# Largest number of open cells getMazeDistance builds an all-pairs table for
+DISTANCE_TABLE_MAX_CELLS = 1000
+# Number of single-source DistanceFields kept per layout above that size
+DISTANCE_FIELD_CACHE_SIZE = 32
+# Side length of the square clusters a ClusterGraph divides the maze into
+CLUSTER_SIZE = 16
+# Entrances at least this wide get a transition at each end as well as one in the middle
+WIDE_ENTRANCE = 6
+
+# Moves are stored as small integer codes; NO_MOVE marks sources and cells that cannot be reached
+MOVES = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+MOVE_CODES = dict([(move, code) for code, move in enumerate(MOVES)])
+REVERSE_CODES = [MOVE_CODES[Actions.reverseDirection(move)] for move in MOVES]
+# The (dx, dy) step of each move, in the same order
+MOVE_VECTORS = [tuple([int(d) for d in Actions.directionToVector(move)]) for move in MOVES]
+NO_MOVE = -1
+# Distance stored for cells no source can reach
+UNREACHABLE = -1
+
+def cellIndex(walls, pos):
+    "Returns the number of the cell at pos in a grid the size of walls"
+    return pos[0] * walls.height + pos[1]
+
+def cellNeighbours(walls, index):
+    """
+    Returns (move code, neighbour index) pairs for the open cells next to the
+    cell with the given number.  The grid is assumed to be walled in, as all
+    Pacman layouts are.
+    """
+    height = walls.height
+    x, y = divmod(index, height)
+    neighbours = []
+    for code, (dx, dy) in enumerate(MOVE_VECTORS):
+        nextx, nexty = x + dx, y + dy
+        if not walls[nextx][nexty]:
+            neighbours.append((code, nextx * height + nexty))
+    return neighbours
+
+class DistanceField:
+    """
+    Shortest distances from one or more sources to every cell of a maze.
+
+    Without a cost function every move costs 1 and the field is built by
+    breadth first search; with one, costFn((x, y)) is the cost of moving
+    into (x, y), as in PositionSearchProblem, and Dijkstra's algorithm is
+    used instead.  With several sources each cell gets the distance to the
+    nearest one (ties go to the source listed first).
+
+    For every reached cell the field keeps
+      distances[i]    the distance from the nearest source,
+      firstMoves[i]   the first move out of that source on a shortest path here,
+      backMoves[i]    the move from this cell one step back towards that source,
+    as flat arrays indexed by cell number; sources have NO_MOVE for both moves.
+
+    Sources can be removed afterwards with removeSource, which only redoes
+    the part of the field that was closest to the removed source.
+    """
+    def __init__(self, walls, sources, costFn=None):
+        self.walls = walls
+        self.width = walls.width
+        self.height = walls.height
+        size = self.width * self.height
+        # Unit costs give integer distances; a cost function may give fractional ones
+        if costFn is None:
+            self.distances = array.array('l', [UNREACHABLE]) * size
+        else:
+            self.distances = array.array('d', [UNREACHABLE]) * size
+        self.firstMoves = array.array('b', [NO_MOVE]) * size
+        self.backMoves = array.array('b', [NO_MOVE]) * size
+        self.sources = [cellIndex(walls, pos) for pos in sources]
+        self.costFn = costFn
+        if costFn is None:
+            self._breadthFirst()
+        else:
+            self._dijkstra(costFn)
+
+    def _breadthFirst(self):
+        walls, distances, firstMoves, backMoves = self.walls, self.distances, self.firstMoves, self.backMoves
+        frontier = []
+        for source in self.sources:
+            if distances[source] == UNREACHABLE:
+                distances[source] = 0
+                frontier.append(source)
+        # Expand one whole layer of the search at a time
+        distance = 0
+        while frontier:
+            distance += 1
+            nextFrontier = []
+            for index in frontier:
+                first = firstMoves[index]
+                for code, neighbour in cellNeighbours(walls, index):
+                    if distances[neighbour] == UNREACHABLE:
+                        distances[neighbour] = distance
+                        # Cells next to a source start their own first move; the rest inherit it
+                        if first == NO_MOVE:
+                            firstMoves[neighbour] = code
+                        else:
+                            firstMoves[neighbour] = first
+                        backMoves[neighbour] = REVERSE_CODES[code]
+                        nextFrontier.append(neighbour)
+            frontier = nextFrontier
+
+    def _dijkstra(self, costFn):
+        walls, distances, firstMoves, backMoves = self.walls, self.distances, self.firstMoves, self.backMoves
+        height = self.height
+        # The heap may hold stale entries for a cell; settled tells them apart
+        settled = array.array('b', [0]) * len(distances)
+        fringe = []
+        for order, source in enumerate(self.sources):
+            if distances[source] == UNREACHABLE:
+                distances[source] = 0
+                heapq.heappush(fringe, (0, order, source))
+        count = len(self.sources)
+        while fringe:
+            distance, _, index = heapq.heappop(fringe)
+            if settled[index]:
+                continue
+            settled[index] = 1
+            first = firstMoves[index]
+            for code, neighbour in cellNeighbours(walls, index):
+                if settled[neighbour]:
+                    continue
+                nextDistance = distance + costFn(divmod(neighbour, height))
+                if distances[neighbour] == UNREACHABLE or nextDistance < distances[neighbour]:
+                    distances[neighbour] = nextDistance
+                    if first == NO_MOVE:
+                        firstMoves[neighbour] = code
+                    else:
+                        firstMoves[neighbour] = first
+                    backMoves[neighbour] = REVERSE_CODES[code]
+                    heapq.heappush(fringe, (nextDistance, count, neighbour))
+                    count += 1
+
+    def getDistance(self, pos):
+        "Returns the distance from the nearest source to pos, or None if no source reaches it"
+        distance = self.distances[cellIndex(self.walls, pos)]
+        if distance == UNREACHABLE:
+            return None
+        return distance
+
+    def getFirstMove(self, pos):
+        "Returns the first move out of the nearest source towards pos, or None at a source or unreached cell"
+        code = self.firstMoves[cellIndex(self.walls, pos)]
+        if code == NO_MOVE:
+            return None
+        return MOVES[code]
+
+    def getMoveToSource(self, pos):
+        "Returns the move from pos one step back towards its nearest source, or None at a source or unreached cell"
+        code = self.backMoves[cellIndex(self.walls, pos)]
+        if code == NO_MOVE:
+            return None
+        return MOVES[code]
+
+    def _walkBack(self, pos):
+        # The cells and moves from pos back to its source, following backMoves
+        index = cellIndex(self.walls, pos)
+        if self.distances[index] == UNREACHABLE:
+            return None, None
+        height = self.height
+        moves = []
+        code = self.backMoves[index]
+        while code != NO_MOVE:
+            moves.append(code)
+            x, y = divmod(index, height)
+            dx, dy = Actions.directionToVector(MOVES[code])
+            index = (x + int(dx)) * height + y + int(dy)
+            code = self.backMoves[index]
+        return index, moves
+
+    def nearestSource(self, pos):
+        "Returns the source closest to pos, or None if no source reaches it"
+        index, _ = self._walkBack(pos)
+        if index is None:
+            return None
+        return divmod(index, self.height)
+
+    def pathToSource(self, pos):
+        "Returns the actions that walk from pos to its nearest source, or None if no source reaches it"
+        _, moves = self._walkBack(pos)
+        if moves is None:
+            return None
+        return [MOVES[code] for code in moves]
+
+    def pathFromSource(self, pos):
+        "Returns the actions that walk from the nearest source to pos, or None if no source reaches it"
+        _, moves = self._walkBack(pos)
+        if moves is None:
+            return None
+        moves.reverse()
+        return [MOVES[REVERSE_CODES[code]] for code in moves]
+
+    def removeSource(self, pos):
+        """
+        Removes the source at pos and brings the field up to date.  Only the
+        cells whose shortest path led back to that source can change: they
+        are cleared and then filled in again from the cells around them,
+        which still hold their distances to the other sources.
+        """
+        index = cellIndex(self.walls, pos)
+        self.sources.remove(index)
+        if index in self.sources:
+            # The same cell was listed twice and is still a source
+            return
+        walls, distances, firstMoves, backMoves = self.walls, self.distances, self.firstMoves, self.backMoves
+        height = self.height
+        # Collect the cells that lead back to the removed source: those whose back move points at a cell already collected
+        region = [index]
+        inRegion = set(region)
+        for cell in region:
+            for code, neighbour in cellNeighbours(walls, cell):
+                if backMoves[neighbour] == REVERSE_CODES[code] and neighbour not in inRegion:
+                    inRegion.add(neighbour)
+                    region.append(neighbour)
+        for cell in region:
+            distances[cell] = UNREACHABLE
+            firstMoves[cell] = NO_MOVE
+            backMoves[cell] = NO_MOVE
+        # Seed the region from its border and relax it again in order of distance
+        fringe = []
+        count = 0
+        for cell in region:
+            for code, neighbour in cellNeighbours(walls, cell):
+                if neighbour not in inRegion and distances[neighbour] != UNREACHABLE:
+                    heapq.heappush(fringe, (distances[neighbour], count, neighbour))
+                    count += 1
+        settled = set()
+        while fringe:
+            distance, _, cell = heapq.heappop(fringe)
+            if cell in settled:
+                continue
+            settled.add(cell)
+            first = firstMoves[cell]
+            for code, neighbour in cellNeighbours(walls, cell):
+                if neighbour not in inRegion or neighbour in settled:
+                    continue
+                if self.costFn is None:
+                    nextDistance = distance + 1
+                else:
+                    nextDistance = distance + self.costFn(divmod(neighbour, height))
+                if distances[neighbour] == UNREACHABLE or nextDistance < distances[neighbour]:
+                    distances[neighbour] = nextDistance
+                    if first == NO_MOVE:
+                        firstMoves[neighbour] = code
+                    else:
+                        firstMoves[neighbour] = first
+                    backMoves[neighbour] = REVERSE_CODES[code]
+                    heapq.heappush(fringe, (nextDistance, count, neighbour))
+                    count += 1
+
+    def reachableCells(self):
+        "Returns the (x, y) positions some source reaches"
+        height = self.height
+        return [divmod(index, height) for index, distance in enumerate(self.distances)
+                if distance != UNREACHABLE]
+
+
+class JunctionGraph:
+    """
+    The maze compressed to its junctions.  Nodes are the open cells that do
+    not have exactly two open neighbours (junctions and dead ends), plus one
+    cell of every loop that has no junction on it.  Every corridor between
+    two nodes becomes one edge, kept as the list of cells it enters and the
+    moves that enter them:
+
+      edges[node] = [(cells, moves), ...]
+
+    so walking an edge from node visits cells[0], cells[1], ..., and ends on
+    the node cells[-1].
+    """
+    def __init__(self, walls):
+        self.walls = walls
+        height = walls.height
+        self.height = height
+        openCells = [(x, y) for x in range(walls.width) for y in range(height) if not walls[x][y]]
+        self.nodes = set([cell for cell in openCells if len(self._moves(cell)) != 2])
+        self.edges = {}
+        covered = set(self.nodes)
+        for node in sorted(self.nodes):
+            self.edges[node] = self._walks(node)
+            for cells, _ in self.edges[node]:
+                covered.update(cells)
+        # Corridors that loop back on themselves without a junction get a node of their own
+        for cell in openCells:
+            if cell not in covered:
+                self.nodes.add(cell)
+                self.edges[cell] = self._walks(cell)
+                covered.add(cell)
+                for cells, _ in self.edges[cell]:
+                    covered.update(cells)
+
+    def _moves(self, cell):
+        # The moves out of cell that do not run into a wall, and the cells they lead to
+        x, y = cell
+        moves = []
+        for move, (dx, dy) in zip(MOVES, MOVE_VECTORS):
+            nextCell = (x + dx, y + dy)
+            if not self.walls[nextCell[0]][nextCell[1]]:
+                moves.append((move, nextCell))
+        return moves
+
+    def _walks(self, start):
+        # Follow each corridor leaving start until it reaches a node
+        walks = []
+        for move, cell in self._moves(start):
+            cells, moves = [cell], [move]
+            previous = start
+            while cell not in self.nodes and cell != start:
+                for nextMove, nextCell in self._moves(cell):
+                    if nextCell != previous:
+                        break
+                previous, cell = cell, nextCell
+                cells.append(cell)
+                moves.append(nextMove)
+            walks.append((cells, moves))
+        return walks
+
+    def getWalks(self, cell):
+        """
+        Returns the (cells, moves) walks from cell to the nodes around it: the
+        edges of a node, or the two ways out of a cell inside a corridor.
+        """
+        walks = self.edges.get(cell)
+        if walks is None:
+            walks = self._walks(cell)
+        return walks
+
+def getJunctionGraph(layout):
+    """
+    Returns the JunctionGraph of a layout, building it the first time and
+    keeping it on the layout.  Every state of a game shares its layout, so
+    all searches during a game reuse one graph.
+    """
+    graph = getattr(layout, 'junctionGraph', None)
+    if graph is None:
+        graph = layout.junctionGraph = JunctionGraph(layout.walls)
+    return graph
+
+class JunctionSearchProblem:
+    """
+    Runs a search problem over positions (such as PositionSearchProblem) on
+    the JunctionGraph of its walls.  Successors are whole corridors: the
+    action is the tuple of Directions walked and the cost is the sum of the
+    problem's costFn (1 per step without one) over the cells entered.  A
+    walk stops early on any cell that passes the problem's goal test, so
+    goals in the middle of a corridor are found at their true cost and the
+    paths stay optimal.  expandActions turns a solution back into Directions.
+    """
+    def __init__(self, problem, graph=None):
+        self.problem = problem
+        self.walls = problem.walls
+        if graph is None:
+            # Problems that do not say which layout they are on get a graph of their own
+            layout = getattr(problem, 'layout', None)
+            if layout is not None:
+                graph = getJunctionGraph(layout)
+            else:
+                graph = JunctionGraph(problem.walls)
+        self.graph = graph
+        self.costFn = getattr(problem, 'costFn', None)
+        # The problem's own goal test, without the SearchStatistics wrapper if it is measured:
+        # the corridor cells tested here are not goal tests of the search
+        self.goalTest = getattr(problem.isGoalState, 'untimed', problem.isGoalState)
+
+    def getStartState(self):
+        return self.problem.getStartState()
+
+    def isGoalState(self, state):
+        return self.goalTest(state)
+
+    def getSuccessors(self, state):
+        problem, costFn, goalTest = self.problem, self.costFn, self.goalTest
+        successors = []
+        for cells, moves in self.graph.getWalks(state):
+            cost = 0
+            last = len(cells) - 1
+            for i, cell in enumerate(cells):
+                if costFn is None:
+                    cost += 1
+                else:
+                    cost += costFn(cell)
+                if i == last or goalTest(cell):
+                    successors.append((cell, tuple(moves[:i + 1]), cost))
+                    break
+        # Bookkeeping for display purposes, as in PositionSearchProblem
+        if hasattr(problem, '_expanded'):
+            problem._expanded += 1
+        return successors
+
+    def expandActions(self, actions):
+        "Flattens a list of corridor actions into the Directions they walk"
+        directions = []
+        for corridor in actions:
+            directions.extend(corridor)
+        return directions
+
+    def getCostOfActions(self, actions):
+        return self.problem.getCostOfActions(self.expandActions(actions))
+
+class ClusterGraph:
+    """
+    The abstraction used by hierarchical path-finding (HPA*).  The maze is
+    cut into square clusters of clusterSize cells.  Wherever open cells face
+    each other across the border of two clusters, the run of such pairs is
+    an entrance, and it gets one transition in its middle (and one at each
+    end as well if it is at least WIDE_ENTRANCE cells wide).  The cells on either
+    side of a transition are the abstract nodes: they are joined to each
+    other with cost 1, and to the other nodes of their cluster by the length
+    of the shortest path that stays inside the cluster.
+
+    findPath plans over these nodes and then refines each step into moves
+    with a small search inside one cluster.  Moves cost 1.  Paths are close
+    to optimal but not guaranteed to be, since a path may only change
+    clusters at transitions.
+    """
+    def __init__(self, walls, clusterSize=CLUSTER_SIZE):
+        self.walls = walls
+        self.clusterSize = clusterSize
+        self.edges = {}
+        self.clusterNodes = {}
+        self._findTransitions()
+        for cluster, nodes in self.clusterNodes.items():
+            for node in nodes:
+                distances = self._clusterSearch(node)[0]
+                for other in nodes:
+                    if other != node and other in distances:
+                        self.edges[node].append((other, distances[other]))
+
+    def clusterOf(self, cell):
+        return (cell[0] // self.clusterSize, cell[1] // self.clusterSize)
+
+    def _addTransition(self, cell1, cell2):
+        for cell, other in ((cell1, cell2), (cell2, cell1)):
+            if cell not in self.edges:
+                self.edges[cell] = []
+                self.clusterNodes.setdefault(self.clusterOf(cell), []).append(cell)
+            self.edges[cell].append((other, 1))
+
+    def _findTransitions(self):
+        walls, size = self.walls, self.clusterSize
+        # Borders between horizontally neighbouring clusters run along y, vertical ones along x
+        for horizontal in (True, False):
+            if horizontal:
+                borders, length = range(size - 1, walls.width - 1, size), walls.height
+            else:
+                borders, length = range(size - 1, walls.height - 1, size), walls.width
+            for border in borders:
+                run = []
+                for along in range(length + 1):
+                    if horizontal:
+                        pair = ((border, along), (border + 1, along))
+                    else:
+                        pair = ((along, border), (along, border + 1))
+                    # An entrance ends at a wall or where the clusters along the border change
+                    if along < length and not walls[pair[0][0]][pair[0][1]] and not walls[pair[1][0]][pair[1][1]] \
+                       and (not run or along % size != 0):
+                        run.append(pair)
+                        continue
+                    if run:
+                        if len(run) >= WIDE_ENTRANCE:
+                            self._addTransition(*run[0])
+                            self._addTransition(*run[len(run) // 2])
+                            self._addTransition(*run[-1])
+                        else:
+                            self._addTransition(*run[len(run) // 2])
+                    run = []
+                    if along < length and not walls[pair[0][0]][pair[0][1]] and not walls[pair[1][0]][pair[1][1]]:
+                        run.append(pair)
+
+    def _clusterSearch(self, start, target=None):
+        """
+        Breadth first search from start that stays inside start's cluster.
+        Returns the distances and the parent links of the cells it reached,
+        stopping early once target is reached.
+        """
+        walls, size = self.walls, self.clusterSize
+        cx, cy = self.clusterOf(start)
+        left, bottom = cx * size, cy * size
+        distances = {start: 0}
+        parents = {start: None}
+        frontier = [start]
+        while frontier:
+            nextFrontier = []
+            for cell in frontier:
+                if cell == target:
+                    return distances, parents
+                x, y = cell
+                for move, (dx, dy) in zip(MOVES, MOVE_VECTORS):
+                    nextx, nexty = x + dx, y + dy
+                    nextCell = (nextx, nexty)
+                    if nextCell in distances or walls[nextx][nexty]:
+                        continue
+                    if not (left <= nextx < left + size and bottom <= nexty < bottom + size):
+                        continue
+                    distances[nextCell] = distances[cell] + 1
+                    parents[nextCell] = (cell, move)
+                    nextFrontier.append(nextCell)
+            frontier = nextFrontier
+        return distances, parents
+
+    def _links(self, cell):
+        # Abstract edges from a cell that may not be a node: to the nodes of its cluster
+        if cell in self.edges:
+            return list(self.edges[cell])
+        distances = self._clusterSearch(cell)[0]
+        return [(node, distances[node]) for node in self.clusterNodes.get(self.clusterOf(cell), [])
+                if node in distances]
+
+    def findPath(self, start, goal, countExpansion=None):
+        """
+        Returns a list of moves from start to goal, or None if there is none.
+        countExpansion(generated), if given, is called for every abstract
+        node expanded.
+        """
+        if start == goal:
+            return []
+        # Connect start and goal to the abstract graph for this query only
+        startLinks = self._links(start)
+        goalLinks = {}
+        for node, distance in self._links(goal):
+            goalLinks[node] = distance
+        if goal in self.edges:
+            goalLinks[goal] = 0
+        # A* over the abstract nodes with the Manhattan distance to the goal
+        def estimate(cell):
+            return abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])
+        fringe = [(estimate(start), 0, 0, start)]
+        costs = {start: 0}
+        parents = {start: None}
+        closed = set()
+        count = 1
+        # A path that never leaves the start's cluster may be the best one
+        if self.clusterOf(start) == self.clusterOf(goal):
+            distances = self._clusterSearch(start, goal)[0]
+            if goal in distances:
+                heapq.heappush(fringe, (distances[goal], 0, count, goal))
+                costs[goal] = distances[goal]
+                parents[goal] = start
+                count += 1
+        while fringe:
+            _, cost, _, cell = heapq.heappop(fringe)
+            if cell in closed:
+                continue
+            if cell == goal:
+                break
+            closed.add(cell)
+            if cell == start:
+                links = startLinks
+            else:
+                links = self.edges.get(cell, [])
+            if cell in goalLinks and cell != goal:
+                links = links + [(goal, goalLinks[cell])]
+            if countExpansion is not None:
+                countExpansion(len(links))
+            for nextCell, stepCost in links:
+                nextCost = cost + stepCost
+                if nextCell not in closed and (nextCell not in costs or nextCost < costs[nextCell]):
+                    costs[nextCell] = nextCost
+                    parents[nextCell] = cell
+                    heapq.heappush(fringe, (nextCost + estimate(nextCell), nextCost, count, nextCell))
+                    count += 1
+        else:
+            return None
+        # Refine every abstract step into moves inside one cluster (or one move across a border)
+        waypoints = [goal]
+        while parents[waypoints[-1]] is not None:
+            waypoints.append(parents[waypoints[-1]])
+        waypoints.reverse()
+        moves = []
+        for source, target in zip(waypoints[:-1], waypoints[1:]):
+            if self.clusterOf(source) != self.clusterOf(target):
+                moves.append(Actions.vectorToDirection((target[0] - source[0], target[1] - source[1])))
+                continue
+            parentLinks = self._clusterSearch(source, target)[1]
+            segment = []
+            cell = target
+            while parentLinks[cell] is not None:
+                cell, move = parentLinks[cell]
+                segment.append(move)
+            segment.reverse()
+            moves.extend(segment)
+        return moves
+
+def getClusterGraph(layout):
+    "Returns the ClusterGraph of a layout, building it the first time and keeping it on the layout"
+    graph = getattr(layout, 'clusterGraph', None)
+    if graph is None:
+        graph = layout.clusterGraph = ClusterGraph(layout.walls)
+    return graph
+
+class CostGrid:
+    """
+    A position-only cost function evaluated once for every open cell of a
+    maze.  costs[x * height + y] is costFn((x, y)) (None for walls), so a
+    search problem can index the list instead of calling the function for
+    every move.  The grid is itself callable like the function it was
+    compiled from.  The costs are kept in a plain list rather than an array
+    so they stay exactly what the function returned: 2 ** x outgrows both
+    64-bit integers and doubles on wide layouts.
+    """
+    def __init__(self, costFn, walls):
+        self.costFn = costFn
+        self.height = walls.height
+        self.costs = [None] * (walls.width * walls.height)
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y]:
+                    self.costs[x * self.height + y] = costFn((x, y))
+
+    def __call__(self, pos):
+        cost = self.costs[pos[0] * self.height + pos[1]]
+        if cost is None:
+            # Walls are never entered by a search; ask the function itself
+            return self.costFn(pos)
+        return cost
+
+def compileCostFunction(costFn, layout):
+    """
+    Returns the CostGrid of costFn over a layout, evaluating the function
+    only the first time it is asked for on that layout.  The grids are kept
+    on the layout (in layout.costGrids, by cost function), so pass the same
+    function object every time rather than a new lambda.  costFn must depend
+    on nothing but the position it is given.
+    """
+    if isinstance(costFn, CostGrid):
+        return costFn
+    grids = getattr(layout, 'costGrids', None)
+    if grids is None:
+        grids = layout.costGrids = {}
+    grid = grids.get(costFn)
+    if grid is None:
+        grid = grids[costFn] = CostGrid(costFn, layout.walls)
+    return grid
+
+class SuccessorTable:
+    """
+    The open neighbours of every open cell of a layout, with the action that
+    reaches each, listed in the order NORTH, SOUTH, EAST, WEST that the
+    search problems have always generated them in:
+
+      moves[(x, y)]        = ((nextPosition, action, nextCell), ...)
+      cellMoves[cell]      = ((nextCell, action), ...)
+
+    where cells are numbered x * height + y.  Built once per layout (see
+    getSuccessorTable) so that successor functions only look moves up.
+    """
+    def __init__(self, walls):
+        self.height = height = walls.height
+        self.moves = {}
+        self.cellMoves = [()] * (walls.width * height)
+        for x in range(walls.width):
+            for y in range(height):
+                if walls[x][y]:
+                    continue
+                moves = []
+                for move, (dx, dy) in zip(MOVES, MOVE_VECTORS):
+                    nextx, nexty = x + dx, y + dy
+                    if not walls[nextx][nexty]:
+                        moves.append(((nextx, nexty), move, nextx * height + nexty))
+                self.moves[(x, y)] = tuple(moves)
+                self.cellMoves[x * height + y] = tuple([(cell, move) for _, move, cell in moves])
+
+def getSuccessorTable(layout):
+    "Returns the SuccessorTable of a layout, building it the first time and keeping it on the layout"
+    table = getattr(layout, 'successorTable', None)
+    if table is None:
+        table = layout.successorTable = SuccessorTable(layout.walls)
+    return table
+
+def distanceMatrix(walls, sources, targets, table=None):
+    """
+    Returns the maze distances from every source to every target as a
+    len(sources) x len(targets) matrix: a numpy array when numpy is
+    installed (with UNREACHABLE where there is no path) and a list of lists
+    otherwise (with None there).  Distances come from the all-pairs table
+    if one is given; otherwise one breadth first pass is made from each
+    distinct point on whichever side has fewer of them, since maze
+    distances are symmetric.
+    """
+    sources, targets = list(sources), list(targets)
+    if table is not None:
+        rows = [[table.getDistance(source, target) for target in targets] for source in sources]
+    else:
+        fromTargets = len(set(targets)) < len(set(sources))
+        if fromTargets:
+            origins, others = targets, sources
+        else:
+            origins, others = sources, targets
+        height = walls.height
+        fields = {}
+        for origin in origins:
+            if origin not in fields:
+                fields[origin] = DistanceField(walls, [origin]).distances
+        rows = []
+        for origin in origins:
+            distances = fields[origin]
+            row = []
+            for other in others:
+                distance = distances[other[0] * height + other[1]]
+                if distance == UNREACHABLE:
+                    distance = None
+                row.append(distance)
+            rows.append(row)
+        if fromTargets:
+            rows = [list(row) for row in zip(*rows)] or [[] for source in sources]
+    if numpy is None:
+        return rows
+    matrix = numpy.empty((len(sources), len(targets)), dtype=numpy.int64)
+    for i, row in enumerate(rows):
+        for j, distance in enumerate(row):
+            if distance is None:
+                matrix[i, j] = UNREACHABLE
+            else:
+                matrix[i, j] = distance
+    return matrix
+
+class DistanceTable:
+    """
+    Maze distances between all pairs of open cells of a layout.
+
+    Open cells get ids 0 .. n-1 in cell number order, and the distance
+    between the cells with ids i and j is entry i * n + j of an n * n array
+    of unsigned 16-bit integers (TABLE_UNREACHABLE where there is no path).
+    The array is either held in memory or read straight out of a
+    memory-mapped cache file, through numpy when it is installed.
+    """
+    TABLE_UNREACHABLE = 0xFFFF
+
+    def __init__(self, walls, table=None):
+        self.walls = walls
+        self.height = walls.height
+        size = walls.width * walls.height
+        # Map cell numbers to open cell ids, with -1 for walls
+        self.cellIds = array.array('l', [-1]) * size
+        self.cells = []
+        for index in range(size):
+            if not walls[index // self.height][index % self.height]:
+                self.cellIds[index] = len(self.cells)
+                self.cells.append(index)
+        self.size = len(self.cells)
+        self.mapped = None
+        if table is None:
+            table = self._build()
+        self.table = table
+
+    def _build(self):
+        n = self.size
+        if n >= self.TABLE_UNREACHABLE:
+            raise ValueError, 'layout has too many open cells for a 16-bit distance table'
+        # Neighbouring open cell ids of every open cell
+        walls, cellIds = self.walls, self.cellIds
+        neighbours = [[cellIds[neighbour] for _, neighbour in cellNeighbours(walls, index)]
+                      for index in self.cells]
+        table = array.array('H', [self.TABLE_UNREACHABLE]) * (n * n)
+        for source in range(n):
+            row = source * n
+            table[row + source] = 0
+            frontier = [source]
+            distance = 0
+            while frontier:
+                distance += 1
+                nextFrontier = []
+                for cell in frontier:
+                    for neighbour in neighbours[cell]:
+                        if table[row + neighbour] == self.TABLE_UNREACHABLE:
+                            table[row + neighbour] = distance
+                            nextFrontier.append(neighbour)
+                frontier = nextFrontier
+        return table
+
+    def getDistance(self, pos1, pos2):
+        "Returns the maze distance between two open cells, or None if there is no path"
+        height = self.height
+        i = self.cellIds[pos1[0] * height + pos1[1]]
+        j = self.cellIds[pos2[0] * height + pos2[1]]
+        if i < 0 or j < 0:
+            raise ValueError, 'no distances are kept for walls: %s, %s' % (pos1, pos2)
+        distance = self._lookup(i * self.size + j)
+        if distance == self.TABLE_UNREACHABLE:
+            return None
+        return distance
+
+    def _lookup(self, offset):
+        table = self.table
+        if isinstance(table, array.array):
+            return table[offset]
+        if numpy is not None and isinstance(table, numpy.ndarray):
+            return int(table[offset])
+        return struct.unpack_from('=H', table, 2 * offset)[0]
+
+    def save(self, path):
+        "Saves the distances to path as native-order 16-bit integers, the format load maps"
+        data = self.table
+        if not isinstance(data, array.array):
+            data = array.array('H', [self._lookup(offset) for offset in range(self.size * self.size)])
+        util.writeFileAtomically(path, data.tofile)
+
+    def load(walls, path):
+        """
+        Returns a DistanceTable for walls that reads the file at path through
+        a memory map, or None if the file is missing or the wrong size.
+        """
+        table = DistanceTable(walls, table=[])
+        expected = 2 * table.size * table.size
+        try:
+            if os.path.getsize(path) != expected:
+                return None
+            if expected == 0:
+                table.table = array.array('H')
+                return table
+            if numpy is not None:
+                table.table = numpy.memmap(path, dtype=numpy.uint16, mode='r')
+                return table
+            source = open(path, 'rb')
+            try:
+                table.table = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                source.close()
+        except (IOError, OSError):
+            return None
+        return table
+    load = staticmethod(load)
+
+def layoutKey(layout):
+    "Returns a hash of the layout's text, naming its distance table"
+    return hashlib.sha1('\n'.join(layout.layoutText)).hexdigest()
+
+def getDistanceTable(layout):
+    """
+    Returns the all-pairs DistanceTable for a layout.  Tables are shared by
+    every layout with the same text: they come from this process's cache if
+    possible, then from DISTANCE_CACHE_DIR, and are built (and saved there)
+    only when neither has one.
+    """
+    table = getattr(layout, 'distanceTable', None)
+    if table is not None:
+        return table
+    key = layoutKey(layout)
+    table = DISTANCE_TABLE_CACHE.get(key)
+    if table is None:
+        path = None
+        if DISTANCE_CACHE_DIR is not None:
+            path = os.path.join(DISTANCE_CACHE_DIR, '%s.%s.dist' % (key, sys.byteorder))
+            table = DistanceTable.load(layout.walls, path)
+        if table is None:
+            table = DistanceTable(layout.walls)
+            if path is not None:
+                util.saveCacheFile(path, table.save)
+        DISTANCE_TABLE_CACHE[key] = table
+    layout.distanceTable = table
+    return table
+
+def getMazeDistance(layout, pos1, pos2):
+    """
+    Returns the maze distance between two open cells of a layout, or None if
+    there is no path.  Layouts with at most DISTANCE_TABLE_MAX_CELLS open cells
+    get an all-pairs table (see getDistanceTable).  Larger ones would take too
+    long to build one for, so a DistanceField is run from one of the points
+    instead and the last DISTANCE_FIELD_CACHE_SIZE of them are kept on the
+    layout, in layout.distanceFields.
+    """
+    table = getattr(layout, 'distanceTable', None)
+    if table is not None:
+        return table.getDistance(pos1, pos2)
+    fields = getattr(layout, 'distanceFields', None)
+    if fields is None:
+        if layout.walls.count(False) <= DISTANCE_TABLE_MAX_CELLS:
+            return getDistanceTable(layout).getDistance(pos1, pos2)
+        fields = layout.distanceFields = util.LRUCache(DISTANCE_FIELD_CACHE_SIZE)
+    # Distances are symmetric, so a field from either point will do
+    field = fields.get(pos2)
+    if field is not None:
+        return field.getDistance(pos1)
+    field = fields.get(pos1)
+    if field is None:
+        field = DistanceField(layout.walls, [pos1])
+        fields[pos1] = field
+    return field.getDistance(pos2)
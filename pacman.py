@@ -279,6 +279,10 @@ class ClassicGameRules:
         initState.initialize( layout, len(ghostAgents) )
         game = Game(agents, display, self, catchExceptions=catchExceptions)
         game.state = initState
+        # Let agents that plan ahead know how long they may take to start up
+        for agentIndex, agent in enumerate(agents):
+            if 'setMaxStartupTime' in dir(agent):
+                agent.setMaxStartupTime(self.getMaxStartupTime(agentIndex))
         self.initialState = initState.deepCopy()
         self.quiet = quiet
         return game
@@ -18,6 +18,27 @@ Pacman agents (in searchAgents.py).
 """
 
 import util
+import heapq
+import json
+import time
+
+# Set to True to have the graph searches print how many popped states were
+# discarded because they had already been extended
+REPORT_DUPLICATES = False
+
+# Default number of search nodes simplifiedMemoryBoundedAStarSearch may keep
+SMA_MAX_NODES = 100000
+
+# Heuristic weight anytimeRepairingAStarSearch starts from, and how much it is
+# lowered after every solution
+ARA_INITIAL_WEIGHT = 3.0
+ARA_WEIGHT_DECREMENT = 0.5
+
+# Default number of heuristic values a MemoizedHeuristic keeps per problem
+HEURISTIC_CACHE_SIZE = 100000
+# Number of problems a MemoizedHeuristic keeps caches for at once; a
+# bidirectional search calls it with both of its directions
+HEURISTIC_CACHE_PROBLEMS = 4
 
 class SearchProblem:
     """
@@ -61,6 +82,178 @@ class SearchProblem:
         """
         util.raiseNotDefined()
 
+    def getPredecessors(self, state):
+        """
+          state: Search state
+
+        Only needed by searches that work backwards from the goal, for
+        problems with a single explicit goal (stored in self.goal).  This
+        should return a list of triples, (predecessor, action, stepCost), where
+        taking 'action' in 'predecessor' leads to 'state' at a cost of
+        'stepCost'.
+        """
+        util.raiseNotDefined()
+
+class ReversedProblem(SearchProblem):
+    """
+    A backwards view of a single-goal search problem: it starts at the goal,
+    its goal is the original start state and its successors are the original
+    predecessors.  Any other attribute (walls, heuristicInfo, ...) is read
+    from the wrapped problem, so the usual heuristics can be evaluated on it.
+    """
+    def __init__(self, problem):
+        self.problem = problem
+        self.goal = problem.getStartState()
+
+    def getStartState(self):
+        return self.problem.goal
+
+    def isGoalState(self, state):
+        return state == self.goal
+
+    def getSuccessors(self, state):
+        return self.problem.getPredecessors(state)
+
+    def getPredecessors(self, state):
+        return self.problem.getSuccessors(state)
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+
+class SearchStatistics:
+    """
+    Measurements of one search: nodes generated, expanded and re-opened,
+    duplicates turned away by the closed set, the peak fringe and final
+    closed set sizes, and the time spent in the problem's successor function
+    and goal test and in the heuristic.
+
+    attach(problem) wraps the problem's methods so they are counted and
+    timed; the search functions look the statistics up with
+    getStatistics(problem) to record the fringe and closed set sizes.
+    Heuristics are only timed when wrapped with timedHeuristic.
+    """
+    def __init__(self, **info):
+        self.info = info # Free-form description of the search (names, layout, ...)
+        self.generated = 0
+        self.expanded = 0
+        self.reopened = 0
+        self.duplicates = 0
+        self.peakFringe = 0
+        self.closedSize = 0
+        self.goalTests = 0
+        self.heuristicCalls = 0
+        self.successorTime = 0.0
+        self.goalTestTime = 0.0
+        self.heuristicTime = 0.0
+        self.totalTime = 0.0
+
+    def attach(self, problem):
+        """
+        Instruments problem (in place) so that its successor functions and
+        goal test feed these statistics.  Returns the problem.  Each wrapper
+        keeps the method it wraps as its 'untimed' attribute, for adapters
+        that call the problem internally and are measured themselves.
+        """
+        problem.searchStats = self
+        for name in ['getSuccessors', 'getPredecessors']:
+            if name in dir(problem):
+                setattr(problem, name, self._timedSuccessors(getattr(problem, name)))
+        isGoalState = problem.isGoalState
+        def timedGoalTest(state):
+            start = time.time()
+            isGoal = isGoalState(state)
+            self.goalTestTime += time.time() - start
+            self.goalTests += 1
+            return isGoal
+        timedGoalTest.untimed = isGoalState
+        problem.isGoalState = timedGoalTest
+        return problem
+
+    def _timedSuccessors(self, successorFunction):
+        def timedSuccessors(state):
+            start = time.time()
+            successors = successorFunction(state)
+            self.successorTime += time.time() - start
+            self.countExpansion(len(successors))
+            return successors
+        timedSuccessors.untimed = successorFunction
+        return timedSuccessors
+
+    def countExpansion(self, generated):
+        "Records one expanded node and the number of nodes it generated"
+        self.expanded += 1
+        self.generated += generated
+
+    def countReopened(self):
+        "Records a state whose cost improved after it had been extended"
+        self.reopened += 1
+
+    def observe(self, fringe, extended):
+        "Records the current fringe and closed set sizes"
+        if len(fringe) > self.peakFringe:
+            self.peakFringe = len(fringe)
+        self.closedSize = len(extended)
+        self.duplicates = extended.rejected
+
+    def asDict(self):
+        return {'info': self.info, 'generated': self.generated,
+                'expanded': self.expanded, 'reopened': self.reopened,
+                'duplicates': self.duplicates, 'peakFringe': self.peakFringe,
+                'closedSize': self.closedSize, 'goalTests': self.goalTests,
+                'heuristicCalls': self.heuristicCalls,
+                'successorTime': self.successorTime,
+                'goalTestTime': self.goalTestTime,
+                'heuristicTime': self.heuristicTime, 'totalTime': self.totalTime}
+
+    def toJson(self):
+        return json.dumps(self.asDict(), sort_keys=True)
+
+class _NoStatistics:
+    "Stands in for SearchStatistics when a problem is not being measured"
+    def countExpansion(self, generated):
+        pass
+
+    def countReopened(self):
+        pass
+
+    def observe(self, fringe, extended):
+        pass
+
+_NO_STATISTICS = _NoStatistics()
+
+def getStatistics(problem):
+    "Returns the SearchStatistics attached to problem, or a stand-in that ignores everything"
+    return getattr(problem, 'searchStats', _NO_STATISTICS)
+
+def reportGoalReached(problem, goal):
+    """
+    For searches that reach the goal without goal-testing it through the
+    problem (bidirectional, jump point and hierarchical search): lets the
+    problem see the goal once, which is when PositionSearchProblem draws
+    its expanded cells.  The test goes to the untimed goal test, so it is
+    not counted in the problem's SearchStatistics.
+    """
+    goalTest = getattr(problem.isGoalState, 'untimed', problem.isGoalState)
+    goalTest(goal)
+
+def timedHeuristic(heuristic):
+    """
+    Wraps heuristic so that calls on problems with attached SearchStatistics
+    are counted and timed.  The null heuristic is returned unchanged.
+    """
+    if heuristic is nullHeuristic:
+        return heuristic
+    def timed(state, problem=None):
+        stats = getattr(problem, 'searchStats', None)
+        if stats is None:
+            return heuristic(state, problem)
+        start = time.time()
+        value = heuristic(state, problem)
+        stats.heuristicTime += time.time() - start
+        stats.heuristicCalls += 1
+        return value
+    return timed
 
 def tinyMazeSearch(problem):
     """
@@ -72,106 +265,290 @@ def tinyMazeSearch(problem):
     w = Directions.WEST
     return  [s, s, w, s, w, w, s, w]
 
+class SearchNode(object):
+    """
+    A node in the search tree.  Instead of carrying a copy of the whole path,
+    each node only remembers the node it was generated from, the action that
+    led to it and the cost of the path so far; the list of actions is rebuilt
+    by walking the parent pointers once a goal has been found.
+    """
+    __slots__ = ('state', 'parent', 'action', 'pathCost')
+
+    def __init__(self, state, parent=None, action=None, stepCost=0):
+        self.state = state
+        self.parent = parent
+        self.action = action
+        if parent is None:
+            self.pathCost = stepCost
+        else:
+            self.pathCost = parent.pathCost + stepCost
+
+    def getPath(self):
+        "Returns the list of actions that leads from the root to this node"
+        path = []
+        node = self
+        while node.parent is not None:
+            path.append(node.action)
+            node = node.parent
+        path.reverse()
+        return path
+
+class ClosedSet:
+    """
+    The set of states that have already been extended by a graph search.
+
+    Hashable states are kept in a dictionary, so membership is O(1).  States
+    that cannot be hashed (for instance a tuple holding a list) are frozen
+    into an equivalent hashable key first, and only states that cannot be
+    frozen either fall back to a plain list.
+    """
+    def __init__(self):
+        self.states = {}
+        self.frozen = {}
+        self.unhashable = []
+        self.rejected = 0 # Number of duplicate pops turned away
+
+    def add(self, state):
+        """
+        Marks state as extended.  Returns True if it had not been extended
+        before, and False (counting a rejected duplicate) otherwise.
+        """
+        try:
+            if state in self.states:
+                self.rejected += 1
+                return False
+            self.states[state] = True
+            return True
+        except TypeError:
+            pass
+        try:
+            key = freezeState(state)
+            if key in self.frozen:
+                self.rejected += 1
+                return False
+            self.frozen[key] = True
+            return True
+        except TypeError:
+            pass
+        if state in self.unhashable:
+            self.rejected += 1
+            return False
+        self.unhashable.append(state)
+        return True
+
+    def __contains__(self, state):
+        try:
+            return state in self.states
+        except TypeError:
+            pass
+        try:
+            return freezeState(state) in self.frozen
+        except TypeError:
+            return state in self.unhashable
+
+    def __len__(self):
+        return len(self.states) + len(self.frozen) + len(self.unhashable)
+
+    def report(self):
+        "Prints the number of rejected duplicates if REPORT_DUPLICATES is set"
+        if REPORT_DUPLICATES:
+            print('[search] closed set rejected %d duplicate pops' % self.rejected)
+
+def freezeState(state):
+    """
+    Returns a hashable stand-in for a state built out of lists, tuples, sets
+    and dictionaries.  Raises TypeError if some part of it cannot be hashed.
+    """
+    if isinstance(state, (list, tuple)):
+        return (type(state).__name__,) + tuple([freezeState(item) for item in state])
+    if isinstance(state, (set, frozenset)):
+        return ('set', frozenset([freezeState(item) for item in state]))
+    if isinstance(state, dict):
+        return ('dict', frozenset([(freezeState(k), freezeState(v)) for k, v in state.items()]))
+    hash(state)
+    return state
+
+def stateKey(state):
+    "Returns the state itself if it is hashable, and a frozen copy of it otherwise"
+    try:
+        hash(state)
+        return state
+    except TypeError:
+        return freezeState(state)
+
+class MemoizedHeuristic:
+    """
+    Wraps heuristic(state, problem) so that each state's value is computed
+    once and then served from a bounded LRU cache (util.LRUCache) keyed by
+    key(state).  Each problem the heuristic is called with gets a cache of
+    its own, and the caches of the last HEURISTIC_CACHE_PROBLEMS problems
+    are kept, so searches that switch between problems (such as the two
+    directions of bidirectionalSearch) keep their values.  hits, misses and
+    evictions count how the caches did since the last reset().
+    """
+    def __init__(self, heuristic, capacity=HEURISTIC_CACHE_SIZE, key=stateKey):
+        self.heuristic = heuristic
+        self.capacity = capacity
+        self.key = key
+        self.reset()
+
+    def reset(self):
+        "Drops every cached value and count"
+        # id(problem) -> (problem, cache); holding the problem keeps its id from being reused
+        self.caches = util.LRUCache(HEURISTIC_CACHE_PROBLEMS)
+        self.problem = None
+        self.cache = None
+
+    def __call__(self, state, problem=None):
+        if problem is not self.problem or self.cache is None:
+            entry = self.caches.get(id(problem))
+            if entry is None or entry[0] is not problem:
+                entry = (problem, util.LRUCache(self.capacity))
+                self.caches[id(problem)] = entry
+            self.problem, self.cache = entry
+        key = self.key(state)
+        value = self.cache.get(key)
+        if value is None:
+            value = self.heuristic(state, problem)
+            self.cache[key] = value
+        return value
+
+    def counts(self):
+        "Returns the caches' hit, miss and eviction counts, added up, as a dictionary"
+        counts = {'hits': 0, 'misses': 0, 'evictions': 0}
+        for problem, cache in self.caches.entries.values():
+            counts['hits'] += cache.hits
+            counts['misses'] += cache.misses
+            counts['evictions'] += cache.evictions
+        return counts
+
+def nodeState(node):
+    "Key for the frontier of uniform cost and A* search: one entry per state"
+    return node.state
+
+def frozenNodeState(node):
+    "Frontier key for states built out of lists, sets and dictionaries"
+    return freezeState(node.state)
+
+def makeFrontier(startState):
+    """
+    Returns the priority queue for uniform cost and A* search.  It keeps one
+    entry per state and lowers its priority in place when a cheaper path
+    turns up, using buckets while every priority is a small non-negative
+    integer and a heap otherwise.  If the states cannot be used as keys even
+    after freezing them we fall back to the plain queue, whose update()
+    simply pushes another entry for them.
+    """
+    try:
+        hash(startState)
+        return util.AdaptivePriorityQueue(nodeState)
+    except TypeError:
+        pass
+    try:
+        freezeState(startState)
+        return util.AdaptivePriorityQueue(frozenNodeState)
+    except TypeError:
+        return util.PriorityQueue()
+
 def depthFirstSearch(problem):
-    # Store the starting coordinates of Pacman on the board
-    startState = problem.getStartState()
     # Initialize stack for the fringe list
     fringe = util.Stack()
-    # Initialize extended list for the nodes that have been visited
-    extended = []
-    # Push the start state to the stack along with an empty list for the directions for a given path
-    fringe.push(([startState], []))
+    # Statistics to report the fringe and closed set sizes to, if the problem is measured
+    stats = getStatistics(problem)
+    # Initialize the closed set for the nodes that have been visited
+    extended = ClosedSet()
+    # Push a root node for the starting coordinates of Pacman on the board
+    fringe.push(SearchNode(problem.getStartState()))
     # Process stack until either it becomes empty or hits goal state
     while not fringe.isEmpty():
         # Pop the current node from the stack
-        state, path= fringe.pop()
-        # Take the latest coordinate from our path
-        current = state[-1]
+        node = fringe.pop()
+        current = node.state
         # Check if goal state has been reached
         if problem.isGoalState(current) == True:
-            return path
-        # Check if the current node has been extended
-        if current not in extended:
-            # Append the node in the extended list
-            extended.append(current)
+            extended.report()
+            return node.getPath()
+        # Check if the current node has been extended, and mark it as extended if not
+        if extended.add(current):
             # Get the successor nodes of the current position - A triplet with (position, direction, cost)
             neighbours = problem.getSuccessors(current)
             for item in neighbours:
-                nextState = [item[0]]
-                nextPath = [item[1]]
-                #Add the successor to the current node (to keep track of our path) and push it to the fringe list
-                fringe.push((state + nextState, path + nextPath))
+                # Link the successor to the current node (to keep track of our path) and push it to the fringe list
+                fringe.push(SearchNode(item[0], node, item[1]))
+            stats.observe(fringe, extended)
+    # The fringe ran out without reaching a goal
+    extended.report()
 
 
 def breadthFirstSearch(problem):
     """Search the shallowest nodes in the search tree first."""
     "*** YOUR CODE HERE ***"
-    # Store the starting coordinates of Pacman on the board
-    startState = problem.getStartState()
     # Initialize a queue for the fringe list
     fringe = util.Queue()
-    # Initialize extended list for the nodes that have been visited
-    extended = []
-    # Push the start state to the stack along with an empty list for the directions for a given path
-    fringe.push(([startState], []))
+    # Statistics to report the fringe and closed set sizes to, if the problem is measured
+    stats = getStatistics(problem)
+    # Initialize the closed set for the nodes that have been visited
+    extended = ClosedSet()
+    # Push a root node for the starting coordinates of Pacman on the board
+    fringe.push(SearchNode(problem.getStartState()))
     # Process queue until either it becomes empty or hits goal state (seen below)
     while not fringe.isEmpty():
         # Pop the current node from the queue
-        state, path = fringe.pop()
-        # Take the latest coordinate from our path
-        current = state[-1]
+        node = fringe.pop()
+        current = node.state
         # Check if goal state has been reached
         if problem.isGoalState(current) == True:
-            return path
-        # Check if the current node has been extended
-        if current not in extended:
-            # Append the node in the extended list
-            extended.append(current)
+            extended.report()
+            return node.getPath()
+        # Check if the current node has been extended, and mark it as extended if not
+        if extended.add(current):
             # Get the successor nodes of the current position - A triplet with (position, direction, cost)
             neighbours = problem.getSuccessors(current)
             for item in neighbours:
-                nextState = [item[0]]
-                nextPath = [item[1]]
-                # Add the successor to the current node (to keep track of our path) and push it to the fringe list
-                fringe.push((state + nextState, path + nextPath))
+                # Link the successor to the current node (to keep track of our path) and push it to the fringe list
+                fringe.push(SearchNode(item[0], node, item[1]))
+            stats.observe(fringe, extended)
+    # The fringe ran out without reaching a goal
+    extended.report()
 
 
     # util.raiseNotDefined()
 
 def uniformCostSearch(problem):
     """Search the node of least total cost first."""
-    # Store the starting coordinates of Pacman on the board
-    startState = problem.getStartState()
     # Initialize a priority queue for the fringe list
-    fringe = util.PriorityQueue()
-    # Initialize extended list for the nodes that have been visited
-    extended = []
-    # Push the start state to the P-queue along with two empty list(one for the directions, one for cost)
-    # with 0 initial priority
-    fringe.push(([startState], [], []), 0)
+    startState = problem.getStartState()
+    fringe = makeFrontier(startState)
+    # Statistics to report the fringe and closed set sizes to, if the problem is measured
+    stats = getStatistics(problem)
+    # Initialize the closed set for the nodes that have been visited
+    extended = ClosedSet()
+    # Push a root node for the starting coordinates of Pacman on the board with 0 initial priority
+    fringe.push(SearchNode(startState), 0)
     # Process queue until either it becomes empty or hits goal state
     while not fringe.isEmpty():
-        # Pop the current node from the stack
-        state, path, cost = fringe.pop()
-        # Take the latest coordinate from our path
-        current = state[-1]
+        # Pop the current node from the P-queue
+        node = fringe.pop()
+        current = node.state
         # Check if goal state has been reached
         if problem.isGoalState(current) == True:
-            return path
-        # Check if the current node has been extended
-        if current not in extended:
-            # Append the node in the extended list
-            extended.append(current)
+            extended.report()
+            return node.getPath()
+        # Check if the current node has been extended, and mark it as extended if not
+        if extended.add(current):
             # Get the successor nodes of the current position - A triplet with (position, direction, cost)
             neighbours = problem.getSuccessors(current)
             for item in neighbours:
-                nextState = [item[0]]
-                nextPath = [item[1]]
-                nextCost = [item[2]]
-                totalCost = cost + nextCost
-                # Add the successor to the current node (to keep track of our path) and push it to the fringe list
-                # Push the path cost up to that node as priority to the queue
-                fringe.push((state + nextState, path + nextPath, totalCost), sum(totalCost))
+                # States that were already extended have their cheapest path settled
+                if item[0] in extended:
+                    continue
+                # Link the successor to the current node; the node accumulates the path cost up to it
+                nextNode = SearchNode(item[0], node, item[1], item[2])
+                # Queue the node, or lower the priority of the state's entry if this path is cheaper
+                fringe.update(nextNode, nextNode.pathCost)
+            stats.observe(fringe, extended)
+    # The fringe ran out without reaching a goal
+    extended.report()
 
 
 
@@ -189,39 +566,526 @@ def aStarSearch(problem, heuristic=nullHeuristic):
     # Store the starting coordinates of Pacman on the board
     startState = problem.getStartState()
     # Initialize a priority queue for the fringe list
-    fringe = util.PriorityQueue()
-    # Initialize extended list for the nodes that have been visited
-    extended = []
-    # Push the start state to the stack along with 2 empty lists (action, cost) and the heuristic as priority
-    fringe.push(([startState], [], []), heuristic(startState, problem))
+    fringe = makeFrontier(startState)
+    # Statistics to report the fringe and closed set sizes to, if the problem is measured
+    stats = getStatistics(problem)
+    # Initialize the closed set for the nodes that have been visited
+    extended = ClosedSet()
+    # Push a root node for the start state with the heuristic as priority
+    fringe.push(SearchNode(startState), heuristic(startState, problem))
     # Process P-queue until either it becomes empty or hits goal state
     while not fringe.isEmpty():
         # Pop the current node from the P-queue
-        state, path, cost = fringe.pop()
-        # Take the latest coordinate from our path
-        current = state[-1]
+        node = fringe.pop()
+        current = node.state
         # Check if goal state has been reached
         if problem.isGoalState(current) == True:
-            return path
-        # Check if the current node has been extended
-        if current not in extended:
-            # Append the node in the extended list
-            extended.append(current)
+            extended.report()
+            return node.getPath()
+        # Check if the current node has been extended, and mark it as extended if not
+        if extended.add(current):
             # Get the successor nodes of the current position - A triplet with (position, direction, cost)
             neighbours = problem.getSuccessors(current)
             for item in neighbours:
-                nextState = [item[0]]
-                nextPath = [item[1]]
-                nextCost = [item[2]]
-                totalCost = cost + nextCost
+                # States that were already extended are never reopened
+                if item[0] in extended:
+                    continue
+                # Link the successor to the current node; the node accumulates the path cost up to it
+                nextNode = SearchNode(item[0], node, item[1], item[2])
                 # Compute the heuristic for the next node
                 heu = heuristic(item[0],problem)
-                # Push the next node into the queue with path cost + heuristic as priority
-                fringe.push((state + nextState, path + nextPath, totalCost), sum(totalCost) + heu)
+                # Queue the node with path cost + heuristic as priority, or lower the priority of the state's entry
+                fringe.update(nextNode, nextNode.pathCost + heu)
+            stats.observe(fringe, extended)
+    # The fringe ran out without reaching a goal
+    extended.report()
+
+
+def iterativeDeepeningAStarSearch(problem, heuristic=nullHeuristic):
+    """
+    Runs a series of depth-first searches, each cut off where g + h exceeds a
+    threshold.  The threshold starts at h(start) and is raised to the
+    smallest value that exceeded it in the previous iteration, so the first
+    goal found is optimal for an admissible heuristic.  Only the current path
+    is kept in memory; states already on it are skipped to avoid cycles.
+    """
+    root = SearchNode(problem.getStartState())
+    if problem.isGoalState(root.state):
+        return []
+    threshold = heuristic(root.state, problem)
+    while threshold < float('inf'):
+        nextThreshold = float('inf')
+        # States on the current path (with multiplicity) and the stack of
+        # [node, successors, index of the next successor to try]
+        onPath = {stateKey(root.state): 1}
+        stack = [[root, problem.getSuccessors(root.state), 0]]
+        while stack:
+            frame = stack[-1]
+            node, successors, index = frame
+            if index == len(successors):
+                # All successors tried, backtrack
+                stack.pop()
+                key = stateKey(node.state)
+                onPath[key] -= 1
+                if onPath[key] == 0:
+                    del onPath[key]
+                continue
+            frame[2] = index + 1
+            item = successors[index]
+            key = stateKey(item[0])
+            if key in onPath:
+                continue
+            nextNode = SearchNode(item[0], node, item[1], item[2])
+            f = nextNode.pathCost + heuristic(item[0], problem)
+            if f > threshold:
+                # Remember the smallest f beyond the cut-off for the next iteration
+                nextThreshold = min(nextThreshold, f)
+                continue
+            if problem.isGoalState(item[0]):
+                return nextNode.getPath()
+            onPath[key] = onPath.get(key, 0) + 1
+            stack.append([nextNode, problem.getSuccessors(item[0]), 0])
+        threshold = nextThreshold
+    return None
+
+class _MemoryBoundedNode(SearchNode):
+    "A SearchNode with the bookkeeping simplifiedMemoryBoundedAStarSearch needs"
+    __slots__ = ('f', 'depth', 'children', 'forgotten', 'stamp', 'wasExpanded')
+
+    def __init__(self, state, parent=None, action=None, stepCost=0):
+        SearchNode.__init__(self, state, parent, action, stepCost)
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.children = []                # Children currently in memory
+        self.forgotten = {}               # Backed-up f of each pruned child, by state
+        self.stamp = None                 # Identifies the node's live open list entry
+        self.wasExpanded = False          # Successors generated again are re-opened
+
+    def hasAncestor(self, state):
+        "Returns True if state is already on the path leading to this node"
+        node = self
+        while node is not None:
+            if node.state == state:
+                return True
+            node = node.parent
+        return False
+
+def simplifiedMemoryBoundedAStarSearch(problem, heuristic=nullHeuristic, maxNodes=None):
+    """
+    A* tree search that keeps at most maxNodes search nodes (SMA_MAX_NODES by
+    default).
+
+    When memory is full the shallowest leaf with the highest f is pruned.
+    Its parent remembers the f of each pruned child and stays on the open
+    list with the lowest of them, so the pruned successors are regenerated
+    (with the f they had) if they become the most promising ones again.
+    f values are made monotone along paths (pathmax), and successors already
+    on the current path are skipped to avoid cycles.  A path of maxNodes
+    nodes fills the whole budget, so a successor that deep which is not a
+    goal gets f = infinity: it can never lead to a solution that fits.
+
+    The search fails (returns None) if the optimal solution does not fit in
+    the node budget, or if regenerating pruned successors stops making
+    progress.
+    """
+    if maxNodes is None:
+        maxNodes = SMA_MAX_NODES
+    infinity = float('inf')
+    # Nodes to expand (or to regenerate pruned children of) as a min-heap on
+    # (f, -depth), and leaves that may be pruned as a max-heap on (f, -depth).
+    # Both use lazy deletion: an entry is live only while its stamp is the node's
+    openMin, leaves = [], []
+    counter = [0]
+    def push(node, f, isLeaf):
+        counter[0] += 1
+        node.stamp = counter[0]
+        if f < infinity:
+            heapq.heappush(openMin, (f, -node.depth, node.stamp, node))
+        if isLeaf:
+            heapq.heappush(leaves, (-f, node.depth, node.stamp, node))
+    def pop(heap):
+        while heap:
+            entry = heapq.heappop(heap)
+            node = entry[3]
+            if node.stamp == entry[2]:
+                node.stamp = None
+                return node, entry[0]
+        return None, None
 
+    stats = getStatistics(problem)
+    root = _MemoryBoundedNode(problem.getStartState())
+    root.f = heuristic(root.state, problem)
+    stored = 1
+    push(root, root.f, True)
+    # (node, f) pairs whose new successors were all pruned straight away since
+    # the search last made progress; meeting one again means it is going round
+    # in circles
+    stalled = set()
+    while True:
+        node, f = pop(openMin)
+        if node is None:
+            return None
+        if not node.children and problem.isGoalState(node.state):
+            return node.getPath()
+        # Generate the successors that are not in memory: all of them for a
+        # leaf, the pruned ones for a node that still has children
+        forgotten = node.forgotten
+        node.forgotten = {}
+        inMemory = [child.state for child in node.children]
+        regenerating = node.wasExpanded
+        node.wasExpanded = True
+        generated = []
+        for item in problem.getSuccessors(node.state):
+            if item[0] in inMemory or node.hasAncestor(item[0]):
+                continue
+            if regenerating:
+                stats.countReopened()
+            nextNode = _MemoryBoundedNode(item[0], node, item[1], item[2])
+            if nextNode.depth >= maxNodes - 1 and not problem.isGoalState(item[0]):
+                # No deeper node fits in memory, so this path is hopeless
+                nextNode.f = infinity
+            else:
+                nextNode.f = max(f, nextNode.pathCost + heuristic(item[0], problem))
+                # A regenerated child keeps what was learned before it was pruned
+                nextNode.f = max(nextNode.f, forgotten.get(stateKey(item[0]), nextNode.f))
+            generated.append(nextNode)
+            node.children.append(nextNode)
+            stored += 1
+            push(nextNode, nextNode.f, True)
+        if not node.children:
+            # Dead end: keep it around as a leaf that can only be pruned
+            node.f = infinity
+            push(node, infinity, True)
+            continue
+        # Prune the least promising leaves until the tree fits in memory again
+        while stored > maxNodes:
+            leaf, _ = pop(leaves)
+            if leaf is None or leaf is root:
+                return None
+            stored -= 1
+            # Back the leaf's f up into its parent
+            parent = leaf.parent
+            parent.children.remove(leaf)
+            parent.forgotten[stateKey(leaf.state)] = leaf.f
+            if parent.children:
+                push(parent, min(parent.forgotten.values()), False)
+            else:
+                parent.f = min(parent.forgotten.values())
+                push(parent, parent.f, True)
+        # Progress means a new successor stayed in memory or the node's f rose
+        kept = [child for child in generated if child in node.children]
+        if kept or (node.forgotten and min(node.forgotten.values()) > f):
+            stalled.clear()
+        elif (node, f) in stalled:
+            return None
+        else:
+            stalled.add((node, f))
+
+def bidirectionalSearch(problem, heuristic=nullHeuristic):
+    """
+    Searches forwards from the start and backwards from the goal at the same
+    time, and stops once no unexplored path can beat the best meeting point
+    found so far.  With the null heuristic this is bidirectional uniform cost
+    search (bidirectional BFS on unit costs); otherwise it is bidirectional A*
+    where each direction uses the heuristic towards its own target.
+
+    The problem needs a single goal in problem.goal, hashable states and a
+    getPredecessors method.
+    """
+    startState = problem.getStartState()
+    if problem.isGoalState(startState):
+        return []
+    # One search frontier per direction; the backward one runs on the reversed problem
+    forward = _SearchFrontier(problem, heuristic)
+    backward = _SearchFrontier(ReversedProblem(problem), heuristic)
+    forward.other, backward.other = backward, forward
+    # Cost and end nodes of the cheapest complete path found so far
+    best = [float('inf'), None, None]
+    while not forward.fringe.isEmpty() and not backward.fringe.isEmpty():
+        # Lower bound on the cost of any path that has not been found yet
+        bound = max(forward.fringe.peekPriority(), backward.fringe.peekPriority())
+        if heuristic is nullHeuristic:
+            bound = max(bound, forward.fringe.peekPriority() + backward.fringe.peekPriority())
+        if bound >= best[0]:
+            break
+        # Grow the smaller frontier
+        if len(forward.fringe) <= len(backward.fringe):
+            forward.expand(best)
+        else:
+            backward.expand(best)
+    forward.extended.report()
+    backward.extended.report()
+    if best[1] is None:
+        return None
+    reportGoalReached(problem, problem.goal)
+    # The backward node's parent pointers already run towards the goal
+    path = best[1].getPath()
+    node = best[2]
+    while node.parent is not None:
+        path.append(node.action)
+        node = node.parent
+    return path
+
+class _SearchFrontier:
+    "One direction of a bidirectional search"
+    def __init__(self, problem, heuristic):
+        self.problem = problem
+        self.heuristic = heuristic
+        self.fringe = util.PriorityQueue()
+        self.extended = ClosedSet()
+        # Cheapest node found so far for every generated state
+        self.nodes = {}
+        root = SearchNode(problem.getStartState())
+        self.nodes[root.state] = root
+        self.fringe.push(root, heuristic(root.state, problem))
+        self.stats = getStatistics(problem)
+
+    def expand(self, best):
+        """
+        Extends the most promising node of this direction and records in best
+        any cheaper path that meets the other direction.
+        """
+        node = self.fringe.pop()
+        if node is not self.nodes[node.state] or not self.extended.add(node.state):
+            return
+        otherNodes = self.other.nodes
+        for item in self.problem.getSuccessors(node.state):
+            known = self.nodes.get(item[0])
+            if known is not None and known.pathCost <= node.pathCost + item[2]:
+                continue
+            nextNode = SearchNode(item[0], node, item[1], item[2])
+            self.nodes[item[0]] = nextNode
+            self.fringe.push(nextNode, nextNode.pathCost + self.heuristic(item[0], self.problem))
+            # Check whether the other direction has already reached this state
+            meeting = otherNodes.get(item[0])
+            if meeting is not None and nextNode.pathCost + meeting.pathCost < best[0]:
+                best[0] = nextNode.pathCost + meeting.pathCost
+                if isinstance(self.problem, ReversedProblem):
+                    best[1], best[2] = meeting, nextNode
+                else:
+                    best[1], best[2] = nextNode, meeting
+        self.stats.observe(self.fringe, self.extended)
+
+
+def anytimeRepairingAStarSearch(problem, heuristic=nullHeuristic, timeLimit=None):
+    """
+    Anytime Repairing A* (ARA*).  A first path is found quickly by weighted A*
+    with f = g + w * h, whose cost is at most w times the optimal cost.  The
+    weight is then lowered step by step (ARA_INITIAL_WEIGHT, minus
+    ARA_WEIGHT_DECREMENT each time, down to 1) and the search is repaired
+    rather than restarted: only states whose cost improved are re-expanded.
+
+    With a timeLimit (in seconds) the search stops when it runs out and
+    returns the best path found so far; None if none was found in time.
+    """
+    deadline = None
+    if timeLimit is not None:
+        deadline = time.time() + timeLimit
+    weight = max(ARA_INITIAL_WEIGHT, 1.0)
+    # Cheapest node found so far for every state
+    startState = problem.getStartState()
+    root = SearchNode(startState)
+    nodes = {stateKey(startState): root}
+    # States that improved after being extended in the current iteration
+    inconsistent = {}
+    # Goal states seen so far, and the cheapest goal node
+    goals = {}
+    best = None
+    fringe = util.PriorityQueue()
+    fringe.push(root, weight * heuristic(startState, problem))
+    stats = getStatistics(problem)
+    while True:
+        extended = ClosedSet()
+        # Improve the path: weighted A* until no open node could lead to a better goal
+        while not fringe.isEmpty():
+            if deadline is not None and time.time() > deadline:
+                return _pathTo(best)
+            if best is not None and best.pathCost <= fringe.peekPriority():
+                break
+            node = fringe.pop()
+            key = stateKey(node.state)
+            if nodes[key] is not node or not extended.add(node.state):
+                continue
+            if problem.isGoalState(node.state):
+                goals[key] = True
+                if best is None or node.pathCost < best.pathCost:
+                    best = node
+                continue
+            for item in problem.getSuccessors(node.state):
+                nextKey = stateKey(item[0])
+                known = nodes.get(nextKey)
+                if known is not None and known.pathCost <= node.pathCost + item[2]:
+                    continue
+                nextNode = SearchNode(item[0], node, item[1], item[2])
+                nodes[nextKey] = nextNode
+                if nextKey in goals and nextNode.pathCost < best.pathCost:
+                    best = nextNode
+                if item[0] in extended:
+                    # Already extended in this iteration; repaired in the next one
+                    inconsistent[nextKey] = nextNode
+                    stats.countReopened()
+                else:
+                    fringe.push(nextNode, nextNode.pathCost + weight * heuristic(item[0], problem))
+            stats.observe(fringe, extended)
+        if weight <= 1.0 or best is None:
+            return _pathTo(best)
+        # Lower the weight and rebuild the fringe from the open and inconsistent nodes
+        weight = max(1.0, weight - ARA_WEIGHT_DECREMENT)
+        pending = inconsistent
+        inconsistent = {}
+        while not fringe.isEmpty():
+            node = fringe.pop()
+            key = stateKey(node.state)
+            if nodes[key] is node:
+                pending[key] = node
+        for node in pending.values():
+            fringe.push(node, node.pathCost + weight * heuristic(node.state, problem))
+
+def _pathTo(node):
+    "Returns the path to node, or None if there is no node"
+    if node is None:
+        return None
+    return node.getPath()
+
+def jumpPointSearch(problem):
+    """
+    Jump point search for unit-cost, 4-connected grid problems with a single
+    goal (a PositionSearchProblem with the default cost function).
+
+    It works directly on problem.walls: rather than expanding every cell of a
+    corridor it jumps straight along it and only stops at jump points, the
+    cells where an optimal path may have to turn.  Jump points are expanded
+    in A* order with the Manhattan distance to the goal, so the path has the
+    same cost as A* with manhattanHeuristic finds.
+    """
+    from game import Actions
+    walls = problem.walls
+    goal = problem.goal
+    startState = problem.getStartState()
+    def isOpen(x, y):
+        return 0 <= x < walls.width and 0 <= y < walls.height and not walls[x][y]
+    def jump(x, y, dx, dy):
+        "Walks from (x, y) towards (dx, dy) and returns the first jump point, or None"
+        while True:
+            x, y = x + dx, y + dy
+            if not isOpen(x, y):
+                return None
+            if (x, y) == goal:
+                return (x, y)
+            if dx != 0:
+                # A wall beside the previous cell ends here, so the path may turn
+                if (isOpen(x, y - 1) and not isOpen(x - dx, y - 1)) or \
+                   (isOpen(x, y + 1) and not isOpen(x - dx, y + 1)):
+                    return (x, y)
+            else:
+                if (isOpen(x - 1, y) and not isOpen(x - 1, y - dy)) or \
+                   (isOpen(x + 1, y) and not isOpen(x + 1, y - dy)):
+                    return (x, y)
+                # Moving vertically, stop wherever a horizontal jump finds something
+                if jump(x, y, 1, 0) is not None or jump(x, y, -1, 0) is not None:
+                    return (x, y)
+    def distanceToGoal(position):
+        return abs(position[0] - goal[0]) + abs(position[1] - goal[1])
+
+    fringe = util.PriorityQueue()
+    extended = ClosedSet()
+    # The jump points found are counted as expansions, since getSuccessors is never called
+    stats = getStatistics(problem)
+    countsExpansions = hasattr(problem, '_expanded')
+    # Node actions are (direction, number of steps) pairs
+    fringe.push(SearchNode(startState), distanceToGoal(startState))
+    while not fringe.isEmpty():
+        node = fringe.pop()
+        current = node.state
+        if current == goal:
+            extended.report()
+            reportGoalReached(problem, current)
+            path = []
+            for direction, steps in node.getPath():
+                path += [direction] * steps
+            return path
+        if not extended.add(current):
+            continue
+        if countsExpansions:
+            problem._expanded += 1
+        generated = 0
+        x, y = current
+        # Keep going the same way or turn; never go back the way we came
+        if node.parent is None:
+            directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        else:
+            dx, dy = Actions.directionToVector(node.action[0])
+            dx, dy = int(dx), int(dy)
+            directions = [(dy, dx), (-dy, -dx), (dx, dy)]
+        for dx, dy in directions:
+            jumpPoint = jump(x, y, dx, dy)
+            if jumpPoint is None:
+                continue
+            steps = abs(jumpPoint[0] - x) + abs(jumpPoint[1] - y)
+            action = (Actions.vectorToDirection((dx, dy)), steps)
+            nextNode = SearchNode(jumpPoint, node, action, steps)
+            fringe.push(nextNode, nextNode.pathCost + distanceToGoal(jumpPoint))
+            generated += 1
+        stats.countExpansion(generated)
+        stats.observe(fringe, extended)
+    extended.report()
+    return None
+
+
+def junctionSearch(problem, heuristic=nullHeuristic):
+    """
+    A* search on the corridor-compressed JunctionGraph of a problem over
+    positions (see mazeGraph.JunctionSearchProblem): only junctions, dead
+    ends and goal cells are expanded, and each successor walks a whole
+    corridor.  The heuristic is evaluated on positions of the original
+    problem; the path is optimal whenever A* on the original problem is.
+    """
+    import mazeGraph
+    junctions = mazeGraph.JunctionSearchProblem(problem)
+    stats = getattr(problem, 'searchStats', None)
+    if stats is not None:
+        # Count on the adapter: its goal test and successors use the problem's untimed methods
+        stats.attach(junctions)
+    path = aStarSearch(junctions, lambda state, junctions: heuristic(state, problem))
+    if path is None:
+        return None
+    return junctions.expandActions(path)
+
+def hierarchicalSearch(problem):
+    """
+    Hierarchical path-finding (HPA*) for unit-cost problems with a single
+    goal (a PositionSearchProblem with the default cost function).  It plans
+    over the entrances between square clusters of the maze and then refines
+    each step with a search inside one cluster (see mazeGraph.ClusterGraph).
+    The cluster abstraction is built once per layout; the paths are close to
+    optimal, but not guaranteed to be.
+    """
+    import mazeGraph
+    stats = getStatistics(problem)
+    countsExpansions = hasattr(problem, '_expanded')
+    def countExpansion(generated):
+        if countsExpansions:
+            problem._expanded += 1
+        stats.countExpansion(generated)
+    # Problems that do not say which layout they are on get a graph of their own
+    layout = getattr(problem, 'layout', None)
+    if layout is not None:
+        graph = mazeGraph.getClusterGraph(layout)
+    else:
+        graph = mazeGraph.ClusterGraph(problem.walls)
+    path = graph.findPath(problem.getStartState(), problem.goal, countExpansion)
+    if path is not None:
+        reportGoalReached(problem, problem.goal)
+    return path
 
 # Abbreviations
 bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+bidir = bidirectionalSearch
+idastar = iterativeDeepeningAStarSearch
+smastar = simplifiedMemoryBoundedAStarSearch
+jps = jumpPointSearch
+arastar = anytimeRepairingAStarSearch
+junctions = junctionSearch
+hpastar = hierarchicalSearch
@@ -37,9 +37,12 @@ Good luck and happy searching!
 from game import Directions
 from game import Agent
 from game import Actions
+from game import Grid
 import util
 import time
+import array
 import search
+import mazeGraph
 
 class GoWestAgent(Agent):
     "An agent that goes West until it can't."
@@ -56,6 +59,11 @@ class GoWestAgent(Agent):
 #       after you fill in parts of search.py          #
 #######################################################
 
+# Share of the game's startup time limit that anytime searches may use
+STARTUP_TIME_FRACTION = 0.8
+# Number of food sets whose spanning tree weight foodHeuristic remembers
+FOOD_HEURISTIC_CACHE_SIZE = 100000
+
 class SearchAgent(Agent):
     """
     This very general search agent finds a path using a supplied search
@@ -69,12 +77,25 @@ class SearchAgent(Agent):
       depthFirstSearch or dfs
       breadthFirstSearch or bfs
 
+    With heuristicCache=<n>, the heuristic's values for the last n states
+    are cached (see search.MemoizedHeuristic), e.g.
+      -a fn=astar,prob=FoodSearchProblem,heuristic=foodHeuristic,heuristicCache=50000
+
 
     Note: You should NOT change any code in SearchAgent
     """
 
-    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
+    # File that search statistics are appended to (one JSON object per search), if any
+    statsFile = None
+    searchInfo = {}
+    # The MemoizedHeuristic the search uses, if heuristic caching was asked for
+    memoizedHeuristic = None
+
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic', stats=None,
+                 heuristicCache=0):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
+        self.statsFile = stats
+        self.searchInfo = {'function': fn, 'problem': prob}
 
         # Get the search function from the name and heuristic
         if fn not in dir(search):
@@ -91,8 +112,20 @@ class SearchAgent(Agent):
             else:
                 raise AttributeError, heuristic + ' is not a function in searchAgents.py or search.py.'
             print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
+            self.searchInfo['heuristic'] = heuristic
+            if int(heuristicCache) > 0:
+                print('[SearchAgent] caching up to %d heuristic values' % int(heuristicCache))
+                heur = self.memoizedHeuristic = search.MemoizedHeuristic(heur, int(heuristicCache))
+            if stats != None:
+                # Heuristic calls are only timed when the statistics are saved
+                heur = search.timedHeuristic(heur)
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+            # Only the parameters count; co_varnames lists the local variables after them
+            if 'timeLimit' not in func.func_code.co_varnames[:func.func_code.co_argcount]:
+                self.searchFunction = lambda x: func(x, heuristic=heur)
+            else:
+                # Anytime searches are also told how long they may run
+                self.searchFunction = lambda x: func(x, heuristic=heur, timeLimit=self.getSearchTimeLimit())
 
         # Get the search problem type from the name
         if prob not in globals().keys() or not prob.endswith('Problem'):
@@ -110,12 +143,50 @@ class SearchAgent(Agent):
         state: a GameState object (pacman.py)
         """
         if self.searchFunction == None: raise Exception, "No search function provided for SearchAgent"
-        starttime = time.time()
+        starttime = self.startupStartTime = time.time()
         problem = self.searchType(state) # Makes a new search problem
+        stats = None
+        if self.statsFile != None:
+            # Measure the search only when the statistics are saved; timing every call has a cost
+            stats = search.SearchStatistics(agent=self.__class__.__name__, **self.searchInfo)
+            stats.attach(problem)
+        if self.memoizedHeuristic != None:
+            self.memoizedHeuristic.reset() # Count the cache on this search only
         self.actions  = self.searchFunction(problem) # Find a path
+        totalTime = time.time() - starttime
         totalCost = problem.getCostOfActions(self.actions)
-        print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.time() - starttime))
-        if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
+        print('Path found with total cost of %d in %.1f seconds' % (totalCost, totalTime))
+        if stats != None:
+            print('Search nodes expanded: %d' % stats.expanded)
+        elif '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
+        if self.memoizedHeuristic != None:
+            counts = self.memoizedHeuristic.counts()
+            print('Heuristic cache: %(hits)d hits, %(misses)d misses, %(evictions)d evictions' % counts)
+            if stats != None:
+                stats.info['heuristicCache'] = counts
+        if stats != None:
+            stats.totalTime = totalTime
+            statsFile = open(self.statsFile, 'a')
+            try: statsFile.write(stats.toJson() + '\n')
+            finally: statsFile.close()
+
+    def setMaxStartupTime(self, seconds):
+        """
+        Called by the game rules (ClassicGameRules) with the number of seconds
+        registerInitialState may take.
+        """
+        self.maxStartupTime = seconds
+
+    def getSearchTimeLimit(self):
+        """
+        Returns the number of seconds an anytime search may still use during
+        registerInitialState, or None if the rules set no limit.  A share of
+        the startup time (STARTUP_TIME_FRACTION) is kept as a safety margin.
+        """
+        if getattr(self, 'maxStartupTime', None) is None:
+            return None
+        elapsed = time.time() - self.startupStartTime
+        return max(0, self.maxStartupTime * STARTUP_TIME_FRACTION - elapsed)
 
     def getAction(self, state):
         """
@@ -133,6 +204,48 @@ class SearchAgent(Agent):
         else:
             return Directions.STOP
 
+def expansionDisplay():
+    """
+    Returns the display pacman.py is drawing on if it can show expanded
+    cells, and None otherwise (text display, autograder, batch runs).
+    """
+    import __main__
+    display = getattr(__main__, '_display', None)
+    if display is None or not hasattr(display, 'drawExpandedCells'):
+        return None
+    return display
+
+class ExpansionTrace:
+    """
+    Records the cells a search expands, in order and each one once, for a
+    display to draw.  The cells go into a buffer allocated up front with
+    room for every cell of the maze, and the display is handed the whole
+    trace in one go by draw().
+    """
+    def __init__(self, walls, display):
+        self.height = walls.height
+        size = walls.width * walls.height
+        self.order = array.array('l', [0]) * size
+        self.seen = bytearray(size)
+        self.count = 0
+        self.display = display
+
+    def record(self, position):
+        "Adds position to the trace unless it is already there"
+        index = position[0] * self.height + position[1]
+        if not self.seen[index]:
+            self.seen[index] = 1
+            self.order[self.count] = index
+            self.count += 1
+
+    def cells(self):
+        "Returns the recorded positions in the order they were expanded"
+        return [divmod(self.order[i], self.height) for i in range(self.count)]
+
+    def draw(self):
+        "Hands the recorded positions to the display"
+        self.display.drawExpandedCells(self.cells())
+
 class PositionSearchProblem(search.SearchProblem):
     """
     A search problem defines the state space, start state, goal test, successor
@@ -144,6 +257,9 @@ class PositionSearchProblem(search.SearchProblem):
     Note: this search problem is fully specified; you should NOT change it.
     """
 
+    # Set when costFn is a mazeGraph.CostGrid, whose costs are looked up directly
+    costGrid = None
+
     def __init__(self, gameState, costFn = lambda x: 1, goal=(1,1), start=None, warn=True, visualize=True):
         """
         Stores the start and goal.
@@ -153,16 +269,25 @@ class PositionSearchProblem(search.SearchProblem):
         goal: A position in the gameState
         """
         self.walls = gameState.getWalls()
+        self.layout = gameState.data.layout # Keeps the per-layout tables (see mazeGraph.py)
+        self.successorTable = mazeGraph.getSuccessorTable(self.layout)
         self.startState = gameState.getPacmanPosition()
         if start != None: self.startState = start
         self.goal = goal
         self.costFn = costFn
+        if isinstance(costFn, mazeGraph.CostGrid):
+            self.costGrid = costFn
         self.visualize = visualize
         if warn and (gameState.getNumFood() != 1 or not gameState.hasFood(*goal)):
             print 'Warning: this does not look like a regular search maze'
 
-        # For display purposes
-        self._visited, self._visitedlist, self._expanded = {}, [], 0 # DO NOT CHANGE
+        # For display purposes: expanded cells are only recorded if there is a display to draw them
+        self._expanded = 0 # DO NOT CHANGE
+        self.trace = None
+        if visualize:
+            display = expansionDisplay()
+            if display != None:
+                self.trace = ExpansionTrace(self.walls, display)
 
     def getStartState(self):
         return self.startState
@@ -171,12 +296,9 @@ class PositionSearchProblem(search.SearchProblem):
         isGoal = state == self.goal
 
         # For display purposes only
-        if isGoal and self.visualize:
-            self._visitedlist.append(state)
-            import __main__
-            if '_display' in dir(__main__):
-                if 'drawExpandedCells' in dir(__main__._display): #@UndefinedVariable
-                    __main__._display.drawExpandedCells(self._visitedlist) #@UndefinedVariable
+        if isGoal and self.trace != None:
+            self.trace.record(state)
+            self.trace.draw()
 
         return isGoal
 
@@ -192,23 +314,45 @@ class PositionSearchProblem(search.SearchProblem):
          cost of expanding to that successor
         """
 
-        successors = []
+        # The open neighbours come from the layout's successor table (see mazeGraph.py)
+        moves = self.successorTable.moves[state]
+        if self.costGrid is not None:
+            costs = self.costGrid.costs
+            successors = [ ( nextState, action, costs[cell] ) for nextState, action, cell in moves ]
+        else:
+            costFn = self.costFn
+            successors = [ ( nextState, action, costFn(nextState) ) for nextState, action, cell in moves ]
+
+        # Bookkeeping for display purposes
+        self._expanded += 1 # DO NOT CHANGE
+        if self.trace != None:
+            self.trace.record(state)
+
+        return successors
+
+    def getPredecessors(self, state):
+        """
+        Returns the positions from which one move leads to state, the action
+        taking each of them there and its cost (the cost of entering state).
+        Moves on the board are reversible, so these are just the open
+        neighbours of state.
+        """
+
+        predecessors = []
+        cost = self.costFn(state)
         for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
             x,y = state
             dx, dy = Actions.directionToVector(action)
-            nextx, nexty = int(x + dx), int(y + dy)
-            if not self.walls[nextx][nexty]:
-                nextState = (nextx, nexty)
-                cost = self.costFn(nextState)
-                successors.append( ( nextState, action, cost) )
+            prevx, prevy = int(x - dx), int(y - dy)
+            if not self.walls[prevx][prevy]:
+                predecessors.append( ( (prevx, prevy), action, cost) )
 
         # Bookkeeping for display purposes
         self._expanded += 1 # DO NOT CHANGE
-        if state not in self._visited:
-            self._visited[state] = True
-            self._visitedlist.append(state)
+        if self.trace != None:
+            self.trace.record(state)
 
-        return successors
+        return predecessors
 
     def getCostOfActions(self, actions):
         """
@@ -226,6 +370,14 @@ class PositionSearchProblem(search.SearchProblem):
             cost += self.costFn((x,y))
         return cost
 
+def stayEastCost(pos):
+    "Cost of stepping into pos for StayEastSearchAgent: 1/2^x"
+    return .5 ** pos[0]
+
+def stayWestCost(pos):
+    "Cost of stepping into pos for StayWestSearchAgent: 2^x"
+    return 2 ** pos[0]
+
 class StayEastSearchAgent(SearchAgent):
     """
     An agent for position search with a cost function that penalizes being in
@@ -235,8 +387,9 @@ class StayEastSearchAgent(SearchAgent):
     """
     def __init__(self):
         self.searchFunction = search.uniformCostSearch
-        costFn = lambda pos: .5 ** pos[0]
-        self.searchType = lambda state: PositionSearchProblem(state, costFn, (1, 1), None, False)
+        # The costs are worked out once per layout (see mazeGraph.CostGrid)
+        self.searchType = lambda state: PositionSearchProblem(
+            state, mazeGraph.compileCostFunction(stayEastCost, state.data.layout), (1, 1), None, False)
 
 class StayWestSearchAgent(SearchAgent):
     """
@@ -247,8 +400,9 @@ class StayWestSearchAgent(SearchAgent):
     """
     def __init__(self):
         self.searchFunction = search.uniformCostSearch
-        costFn = lambda pos: 2 ** pos[0]
-        self.searchType = lambda state: PositionSearchProblem(state, costFn)
+        # The costs are worked out once per layout (see mazeGraph.CostGrid)
+        self.searchType = lambda state: PositionSearchProblem(
+            state, mazeGraph.compileCostFunction(stayWestCost, state.data.layout))
 
 def manhattanHeuristic(position, problem, info={}):
     "The Manhattan distance heuristic for a PositionSearchProblem"
@@ -270,6 +424,10 @@ class CornersProblem(search.SearchProblem):
     """
     This search problem finds paths through all four corners of a layout.
     You must select a suitable state space and successor function
+
+    A search state is a single integer packing Pacman's position with a 4-bit
+    mask of the corners visited so far; use encodeState and decodeState to
+    convert to and from (position, visitedCorners).
     """
 
     def __init__(self, startingGameState):
@@ -284,23 +442,44 @@ class CornersProblem(search.SearchProblem):
             if not startingGameState.hasFood(*corner):
                 print 'Warning: no food in corner ' + str(corner)
         self._expanded = 0  # Number of search nodes expanded
+        # States are packed into an integer: the cell number of the position
+        # (x * height + y) shifted left by 4, with one bit per visited corner below it
+        self.height = self.walls.height
+        self.cornerBits = {}
+        for bit, corner in enumerate(self.corners):
+            # Corners of a tiny layout may coincide, in which case entering one visits both
+            self.cornerBits[corner] = self.cornerBits.get(corner, 0) | (1 << bit)
+        self.allCorners = (1 << len(self.corners)) - 1
+        # The same bits by cell number, for the successor function
+        self.cellCornerBits = dict([(corner[0] * self.height + corner[1], bits)
+                                    for corner, bits in self.cornerBits.items()])
+        self.successorTable = mazeGraph.getSuccessorTable(startingGameState.data.layout)
+        self.heuristicInfo = {} # A dictionary for the heuristic to store information
+
+    def encodeState(self, position, visitedCorners):
+        "Packs a position and a collection of visited corners into a search state"
+        mask = 0
+        for corner in visitedCorners:
+            mask |= self.cornerBits[corner]
+        return ((position[0] * self.height + position[1]) << 4) | mask
+
+    def decodeState(self, state):
+        "Unpacks a search state into the position and the list of visited corners, in corner order"
+        position = divmod(state >> 4, self.height)
+        visitedCorners = [corner for bit, corner in enumerate(self.corners) if state & (1 << bit)]
+        return (position, visitedCorners)
 
     def getStartState(self):
         "Returns the start state (in your state space, not the full Pacman state space)"
 
-        # Store visited corners in an array, and give the state as a tuple of
-        # the current state and the visited corners
-        visitedCorners = []
-        return (self.startingPosition, visitedCorners)
+        # No corners have been visited yet
+        return self.encodeState(self.startingPosition, [])
 
     def isGoalState(self, state):
         "Returns whether this search state is a goal state of the problem"
 
-        # Corners are all visited if there are 4 elements in the corners array.
-        if len(state[1]) == 4:
-            return True
-        else:
-            return False
+        # Corners are all visited if all four bits of the mask are set
+        return state & self.allCorners == self.allCorners
 
     def getSuccessors(self, state):
         """
@@ -313,31 +492,27 @@ class CornersProblem(search.SearchProblem):
          cost of expanding to that successor
         """
 
-        # Obtain current state
-        currentPosition = state[0]
-        visitedCorners = state[1]
+        # Obtain current cell number and the visited corners mask
+        cell = state >> 4
+        visitedCorners = state & self.allCorners
+        cellCornerBits = self.cellCornerBits
 
         # INitialize the list of successors to the current position
         successors = []
 
-        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            x, y = currentPosition
-            dx, dy = Actions.directionToVector(action)
-            nextx, nexty = int(x + dx), int(y + dy)
-            hitsWall = self.walls[nextx][nexty]
-            nextPosition = (nextx, nexty)
-            # Check if the successor is a wall -> if not then go in
-            if hitsWall != True:
-                # If the successor is a corner
-                if nextPosition in self.corners:
-                    # Check if the successor is in the visited corners list
-                    if(nextPosition not in visitedCorners):
-                        # Update the visited corners list
-                        newVisitedCorner = visitedCorners + [(nextx, nexty)]
-                        successors.append(((nextPosition, newVisitedCorner), action, 1))
-                else:
-                    # Append the successor to the list
-                    successors.append(((nextPosition, visitedCorners), action, 1))
+        # The open neighbours of the cell come from the layout's successor table
+        for nextCell, action in self.successorTable.cellMoves[cell]:
+            nextState = (nextCell << 4) | visitedCorners
+            cornerBits = cellCornerBits.get(nextCell, 0)
+            # If the successor is a corner
+            if cornerBits:
+                # Check if the successor corner has been visited yet
+                if cornerBits & visitedCorners != cornerBits:
+                    # Mark the corner as visited
+                    successors.append((nextState | cornerBits, action, 1))
+            else:
+                # Append the successor to the list
+                successors.append((nextState, action, 1))
 
         self._expanded += 1
         # Return the successor list
@@ -375,10 +550,8 @@ def cornersHeuristic(state, problem):
     walls = problem.walls  # These are the walls of the maze, as a Grid (game.py)
 
     "*** YOUR CODE HERE ***"
-    # Obtain the current position
-    currentPosition = state[0]
-    # Obtain the list of visited corners
-    cornerState = state[1]
+    # Obtain the current position and the list of visited corners
+    currentPosition, cornerState = problem.decodeState(state)
     #Find the corners that are yet to be visited
     cornersUnvisited = []
     for c in range(len(corners)):
@@ -399,24 +572,127 @@ def cornersHeuristic(state, problem):
     return min
 
 
+def cornersTourHeuristic(state, problem):
+    """
+    The exact length of the shortest walk from Pacman's position through all
+    unvisited corners, using true maze distances and ignoring everything else
+    about the problem.  This is the cost of a relaxed problem, so it is both
+    admissible and consistent.  Select it with
+
+    > python pacman.py -p SearchAgent -a fn=astar,prob=CornersProblem,heuristic=cornersTourHeuristic
+
+    A distance field per corner and the shortest tour over every subset of
+    corners are computed once per problem and kept in problem.heuristicInfo.
+    """
+    info = problem.heuristicInfo
+    if 'cornerFields' not in info:
+        fields = [mazeGraph.DistanceField(problem.walls, [corner]) for corner in problem.corners]
+        info['cornerFields'] = fields
+        info['cornerTours'] = cornerTourLengths(problem, fields)
+    remaining = problem.allCorners & ~state
+    if remaining == 0:
+        return 0
+    # Distance fields are indexed by cell number, which is the state without its corner bits
+    cell = state >> 4
+    tours = info['cornerTours'][remaining]
+    best = None
+    for i, field in enumerate(info['cornerFields']):
+        if tours[i] is None:
+            continue
+        distance = field.distances[cell]
+        if distance == mazeGraph.UNREACHABLE:
+            continue
+        if best is None or distance + tours[i] < best:
+            best = distance + tours[i]
+    if best is None:
+        # No walk reaches the remaining corners; leave it to the search to find out
+        return 0
+    return best
+
+def cornerTourLengths(problem, fields):
+    """
+    Returns tours where tours[mask][i] is the length of the shortest walk that
+    starts at corner i and visits every corner whose bit is set in mask (which
+    must include i), or None if i is not in mask or the corners are not
+    connected.  Computed by dynamic programming over the subsets.
+    """
+    count = len(problem.corners)
+    between = [[field.getDistance(corner) for corner in problem.corners] for field in fields]
+    tours = [[None] * count for mask in range(1 << count)]
+    for mask in range(1, 1 << count):
+        for i in range(count):
+            if not mask & (1 << i):
+                continue
+            rest = mask & ~(1 << i)
+            if rest == 0:
+                tours[mask][i] = 0
+                continue
+            for j in range(count):
+                if tours[rest][j] is None or between[i][j] is None:
+                    continue
+                length = between[i][j] + tours[rest][j]
+                if tours[mask][i] is None or length < tours[mask][i]:
+                    tours[mask][i] = length
+    return tours
+
 class AStarCornersAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
     def __init__(self):
         self.searchFunction = lambda prob: search.aStarSearch(prob, cornersHeuristic)
         self.searchType = CornersProblem
 
+def foodGridToBits(foodGrid):
+    """
+    Packs a food Grid into an integer bitboard with bit x * height + y set for
+    each (x, y) that has food.
+    """
+    bits = 0
+    height = foodGrid.height
+    for x in range(foodGrid.width):
+        column = foodGrid[x]
+        for y in range(height):
+            if column[y]:
+                bits |= 1 << (x * height + y)
+    return bits
+
+def foodBitsToList(bits, height):
+    "Returns the (x, y) positions set in a food bitboard, in the same order as Grid.asList"
+    positions = []
+    while bits:
+        lowest = bits & -bits
+        positions.append(divmod(lowest.bit_length() - 1, height))
+        bits ^= lowest
+    return positions
+
+def foodBitsToGrid(bits, width, height):
+    "Unpacks a food bitboard into a Grid of the given size"
+    foodGrid = Grid(width, height)
+    for x, y in foodBitsToList(bits, height):
+        foodGrid[x][y] = True
+    return foodGrid
+
+def foodBitCount(bits):
+    "Returns the number of food dots on a bitboard"
+    return bin(bits).count('1')
+
 class FoodSearchProblem:
     """
     A search problem associated with finding the a path that collects all of the
     food (dots) in a Pacman game.
 
-    A search state in this problem is a tuple ( pacmanPosition, foodGrid ) where
+    A search state in this problem is a tuple ( pacmanPosition, foodBits ) where
       pacmanPosition: a tuple (x,y) of integers specifying Pacman's position
-      foodGrid:       a Grid (see game.py) of either True or False, specifying remaining food
+      foodBits:       an integer bitboard of the remaining food, with bit
+                      x * height + y set if (x,y) has food
+
+    Use getFoodGrid or getFoodList to turn foodBits back into a Grid or a list.
     """
     def __init__(self, startingGameState):
-        self.start = (startingGameState.getPacmanPosition(), startingGameState.getFood())
+        foodGrid = startingGameState.getFood()
+        self.start = (startingGameState.getPacmanPosition(), foodGridToBits(foodGrid))
         self.walls = startingGameState.getWalls()
+        self.successorTable = mazeGraph.getSuccessorTable(startingGameState.data.layout)
+        self.width, self.height = foodGrid.width, foodGrid.height
         self.startingGameState = startingGameState
         self._expanded = 0 # DO NOT CHANGE
         self.heuristicInfo = {} # A dictionary for the heuristic to store information
@@ -425,20 +701,30 @@ class FoodSearchProblem:
         return self.start
 
     def isGoalState(self, state):
-        return state[1].count() == 0
+        return state[1] == 0
+
+    def getFoodGrid(self, foodBits):
+        "Returns the food bitboard of a state as a Grid"
+        return foodBitsToGrid(foodBits, self.width, self.height)
+
+    def getFoodList(self, foodBits):
+        "Returns the food positions of a state's bitboard, in the same order as Grid.asList"
+        return foodBitsToList(foodBits, self.height)
 
     def getSuccessors(self, state):
         "Returns successor states, the actions they require, and a cost of 1."
         successors = []
         self._expanded += 1 # DO NOT CHANGE
-        for direction in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            x,y = state[0]
-            dx, dy = Actions.directionToVector(direction)
-            nextx, nexty = int(x + dx), int(y + dy)
-            if not self.walls[nextx][nexty]:
-                nextFood = state[1].copy()
-                nextFood[nextx][nexty] = False
-                successors.append( ( ((nextx, nexty), nextFood), direction, 1) )
+        food = state[1]
+        # The open neighbours come from the layout's successor table
+        for nextPosition, direction, cell in self.successorTable.moves[state[0]]:
+            # Eat the dot in the next cell, if there is one
+            bit = 1 << cell
+            if food & bit:
+                nextFood = food ^ bit
+            else:
+                nextFood = food
+            successors.append( ( (nextPosition, nextFood), direction, 1) )
         return successors
 
     def getCostOfActions(self, actions):
@@ -474,9 +760,10 @@ def foodHeuristic(state, problem):
     other hand, inadmissible or inconsistent heuristics may find optimal
     solutions, so be careful.
 
-    The state is a tuple ( pacmanPosition, foodGrid ) where foodGrid is a Grid
-    (see game.py) of either True or False. You can call foodGrid.asList() to get
-    a list of food coordinates instead.
+    The state is a tuple ( pacmanPosition, foodBits ) where foodBits is an
+    integer bitboard of the remaining food. You can call
+    problem.getFoodList(foodBits) to get a list of food coordinates, or
+    problem.getFoodGrid(foodBits) to get a Grid (see game.py) of True or False.
 
     If you want access to info like walls, capsules, etc., you can query the
     problem.  For example, problem.walls gives you a Grid of where the walls
@@ -489,36 +776,91 @@ def foodHeuristic(state, problem):
     Subsequent calls to this heuristic can access
     problem.heuristicInfo['wallCount']
     """
-    position, foodGrid = state
+    position, foodBits = state
     "*** YOUR CODE HERE ***"
-    foodList = foodGrid.asList()
     # Check if all food has been eaten
-    if len(foodList) == 0:
+    if foodBits == 0:
         return 0
-    else:
-        # Compute Manhattan distance from current position to all available food positions
-        min = util.manhattanDistance(position, foodList[0])
-        for item in foodList:
-                distance = util.manhattanDistance(position, item)
-                if (min > distance):
-                    min = distance
-    #Return the distance between the current position and the closest food (obtained by finding min distance)
-    return min
+    info = problem.heuristicInfo
+    if 'dotFields' not in info:
+        # One distance field per dot of the start state gives the maze distance from anywhere to each dot
+        dots = problem.getFoodList(problem.getStartState()[1])
+        info['dotIndex'] = dict([(dot, i) for i, dot in enumerate(dots)])
+        info['dotFields'] = [mazeGraph.DistanceField(problem.walls, [dot]) for dot in dots]
+        info['dotDistances'] = [[field.getDistance(other) for other in dots] for field in info['dotFields']]
+        info['treeWeights'] = util.LRUCache(FOOD_HEURISTIC_CACHE_SIZE)
+    dotIndex, dotFields = info['dotIndex'], info['dotFields']
+    remaining = [dotIndex[dot] for dot in problem.getFoodList(foodBits)]
+    # Maze distance from the current position to the closest remaining dot
+    closest = None
+    for i in remaining:
+        distance = dotFields[i].getDistance(position)
+        if distance is not None and (closest is None or distance < closest):
+            closest = distance
+    if closest is None:
+        return 0
+    # Every path through the remaining dots is at least as long as their minimum spanning tree
+    treeWeight = info['treeWeights'].get(foodBits)
+    if treeWeight is None:
+        treeWeight = spanningTreeWeight(remaining, info['dotDistances'])
+        info['treeWeights'][foodBits] = treeWeight
+    # Return the distance to the closest dot plus the spanning tree weight; this never overestimates
+    return closest + treeWeight
+
+def spanningTreeWeight(dots, distances):
+    """
+    Returns the weight of a minimum spanning tree over the given dot indices,
+    where distances[i][j] is the maze distance between dots i and j (None if
+    they are not connected), using Prim's algorithm.
+    """
+    if not dots:
+        return 0
+    # Cheapest known edge from the tree to every dot not yet in it
+    best = dict([(dot, distances[dots[0]][dot]) for dot in dots[1:]])
+    weight = 0
+    while best:
+        nearest = None
+        for dot, distance in best.items():
+            if distance is not None and (nearest is None or distance < best[nearest]):
+                nearest = dot
+        if nearest is None:
+            # The rest cannot be reached from the tree; leave them out
+            break
+        weight += best.pop(nearest)
+        row = distances[nearest]
+        for dot in best:
+            distance = row[dot]
+            if distance is not None and (best[dot] is None or distance < best[dot]):
+                best[dot] = distance
+    return weight
 
 class ClosestDotSearchAgent(SearchAgent):
     "Search for all food using a sequence of searches"
     def registerInitialState(self, state):
         self.actions = []
-        currentState = state
-        while(currentState.getFood().count() > 0):
-            nextPathSegment = self.findPathToClosestDot(currentState) # The missing piece
+        walls = state.getWalls()
+        # A distance field with every remaining dot as a source; following its back moves
+        # from Pacman leads to the closest dot, and eaten dots are removed incrementally
+        remaining = set(state.getFood().asList())
+        field = mazeGraph.DistanceField(walls, sorted(remaining))
+        x, y = state.getPacmanPosition()
+        if (x, y) in remaining:
+            remaining.remove((x, y))
+            field.removeSource((x, y))
+        while len(remaining) > 0:
+            nextPathSegment = field.pathToSource((x, y))
+            if nextPathSegment is None:
+                raise Exception, 'no path to the remaining food: %s' % sorted(remaining)
             self.actions += nextPathSegment
+            # Replay the segment on Pacman's position rather than on full game states
             for action in nextPathSegment:
-                legal = currentState.getLegalActions()
-                if action not in legal:
-                    t = (str(action), str(currentState))
-                    raise Exception, 'findPathToClosestDot returned an illegal move: %s!\n%s' % t
-                currentState = currentState.generateSuccessor(0, action)
+                dx, dy = Actions.directionToVector(action)
+                x, y = int(x + dx), int(y + dy)
+                if walls[x][y]:
+                    raise Exception, 'the distance field path to the closest dot has an illegal move: %s!' % str(action)
+                if (x, y) in remaining:
+                    remaining.remove((x, y))
+                    field.removeSource((x, y))
         self.actionIndex = 0
         print 'Path found with cost %d.' % len(self.actions)
 
@@ -534,7 +876,8 @@ class ClosestDotSearchAgent(SearchAgent):
         problem = AnyFoodSearchProblem(gameState)
 
         "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
+        # Breadth first search reaches the closest dot first
+        return search.breadthFirstSearch(problem)
 
 class AnyFoodSearchProblem(PositionSearchProblem):
     """
@@ -558,9 +901,12 @@ class AnyFoodSearchProblem(PositionSearchProblem):
 
         # Store info for the PositionSearchProblem (no need to change this)
         self.walls = gameState.getWalls()
+        self.layout = gameState.data.layout # Keeps the per-layout tables (see mazeGraph.py)
+        self.successorTable = mazeGraph.getSuccessorTable(self.layout)
         self.startState = gameState.getPacmanPosition()
         self.costFn = lambda x: 1
-        self._visited, self._visitedlist, self._expanded = {}, [], 0 # DO NOT CHANGE
+        self._expanded = 0 # DO NOT CHANGE
+        self.trace = None
 
     def isGoalState(self, state):
         """
@@ -570,13 +916,15 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         x,y = state
 
         "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
+        # Any position with food on it is a goal
+        return self.food[x][y]
 
 def mazeDistance(point1, point2, gameState):
     """
-    Returns the maze distance between any two points, using the search functions
-    you have already built. The gameState can be any game state -- Pacman's
-    position in that state is ignored.
+    Returns the maze distance between any two points, looked up in the all-pairs
+    distance table of the layout, or measured with a cached distance field on
+    layouts too large for one (see mazeGraph.getMazeDistance). The gameState can
+    be any game state -- Pacman's position in that state is ignored.
 
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
@@ -587,5 +935,23 @@ def mazeDistance(point1, point2, gameState):
     walls = gameState.getWalls()
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.bfs(prob))
+    return mazeGraph.getMazeDistance(gameState.data.layout, point1, point2)
+
+def mazeDistances(sources, targets, gameState):
+    """
+    Returns the maze distances from each of the source points to each of the
+    target points, as a matrix with one row per source: a numpy array if
+    numpy is installed (-1 where there is no path), a list of lists
+    otherwise (None where there is no path).
+
+    If mazeDistance has already built the layout's all-pairs table, the
+    distances are read from it; otherwise one breadth first search is run
+    per distinct source (or per distinct target, if there are fewer).
+
+    Example usage: mazeDistances(food.asList(), ghostPositions, gameState)
+    """
+    walls = gameState.getWalls()
+    for point in list(sources) + list(targets):
+        assert not walls[point[0]][point[1]], 'point is a wall: ' + str(point)
+    table = getattr(gameState.data.layout, 'distanceTable', None)
+    return mazeGraph.distanceMatrix(walls, sources, targets, table)
@@ -0,0 +1,47 @@
+# test_eightpuzzle.py
+# -------------------
+# Regression tests for the pattern database heuristic in eightpuzzle.py.
+# Run with:  python -m pytest test_eightpuzzle.py   (or python -m unittest test_eightpuzzle)
+
+import unittest
+
+import eightpuzzle
+import search
+
+class PatternDatabaseHeuristicTest(unittest.TestCase):
+    def testConsistentOnEveryEightPuzzle(self):
+        # Walk every state reachable from the goal, recording each one's
+        # heuristic value and the states one move away
+        goal = eightpuzzle.PackedPuzzleState(range(9))
+        values = {goal: eightpuzzle.patternDatabaseHeuristic(goal)}
+        self.assertEqual(values[goal], 0)
+        layer = [goal]
+        while layer:
+            nextLayer = []
+            for state in layer:
+                for move in state.legalMoves():
+                    successor = state.result(move)
+                    if successor not in values:
+                        values[successor] = eightpuzzle.patternDatabaseHeuristic(successor)
+                        nextLayer.append(successor)
+                    if abs(values[state] - values[successor]) > 1:
+                        self.fail('h changes by more than one move between\n%s\nand\n%s' % (state, successor))
+            layer = nextLayer
+        self.assertEqual(len(values), 181440)
+
+    def testAStarFindsOptimalPaths(self):
+        # Optimal solution lengths, found with breadth first search
+        optimal = [([4, 1, 0, 2, 8, 5, 6, 7, 3], 20), ([7, 8, 5, 6, 1, 3, 0, 4, 2], 26)]
+        optimal += zip(eightpuzzle.EIGHT_PUZZLE_DATA, [1, 24, 10, 14, 14, 12])
+        for numbers, length in optimal:
+            for puzzle in [eightpuzzle.EightPuzzleState(numbers), eightpuzzle.PackedPuzzleState(numbers)]:
+                path = search.aStarSearch(eightpuzzle.EightPuzzleSearchProblem(puzzle),
+                                          eightpuzzle.patternDatabaseHeuristic)
+                self.assertEqual(len(path), length)
+                state = puzzle
+                for move in path:
+                    state = state.result(move)
+                self.assertTrue(state.isGoal())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# test_search.py
+# --------------
+# Regression tests for the search functions in search.py.
+# Run with:  python -m pytest test_search.py   (or python -m unittest test_search)
+
+import unittest
+
+import search
+import util
+
+class CorridorProblem(search.SearchProblem):
+    "A straight corridor of cells 0..length, starting at 0 with the goal at the far end"
+    def __init__(self, length):
+        self.length = length
+
+    def getStartState(self):
+        return 0
+
+    def isGoalState(self, state):
+        return state == self.length
+
+    def getSuccessors(self, state):
+        successors = []
+        if state < self.length:
+            successors.append((state + 1, 'East', 1))
+        if state > 0:
+            successors.append((state - 1, 'West', 1))
+        return successors
+
+class SimplifiedMemoryBoundedAStarTest(unittest.TestCase):
+    def testBudgetTooSmallFails(self):
+        # A path of 5 steps needs 6 nodes in memory
+        for maxNodes in range(1, 6):
+            self.assertEqual(search.simplifiedMemoryBoundedAStarSearch(CorridorProblem(5), maxNodes=maxNodes), None)
+        for maxNodes in range(1, 13):
+            self.assertEqual(search.simplifiedMemoryBoundedAStarSearch(CorridorProblem(12), maxNodes=maxNodes), None)
+
+    def testBudgetLargeEnoughSucceeds(self):
+        path = search.simplifiedMemoryBoundedAStarSearch(CorridorProblem(5), maxNodes=6)
+        self.assertEqual(path, ['East'] * 5)
+        path = search.simplifiedMemoryBoundedAStarSearch(CorridorProblem(12), maxNodes=100)
+        self.assertEqual(path, ['East'] * 12)
+
+class WeightedCorridorProblem(CorridorProblem):
+    "The corridor, with stepping into cell x costing 2 ** x as for StayWestSearchAgent"
+    def getSuccessors(self, state):
+        return [(nextState, action, 2 ** nextState) for nextState, action, _ in
+                CorridorProblem.getSuccessors(self, state)]
+
+class AdaptivePriorityQueueTest(unittest.TestCase):
+    def testLargeStepCostsUseTheHeap(self):
+        queue = util.AdaptivePriorityQueue()
+        queue.push('start', 0)
+        queue.push('near', util.BucketPriorityQueue.maxSpread)
+        self.assertTrue(queue.bucketed)
+        queue.push('far', 2 ** 15)
+        self.assertFalse(queue.bucketed)
+        self.assertEqual([queue.pop(), queue.pop(), queue.pop()], ['start', 'near', 'far'])
+
+    def testUnitStepsStayBucketed(self):
+        # Priorities far from the start are fine as long as they are close to the lowest one queued
+        queue = util.AdaptivePriorityQueue()
+        queue.push(0, 0)
+        for priority in range(1, 1000):
+            self.assertEqual(queue.pop(), priority - 1)
+            queue.push(priority, priority)
+        self.assertTrue(queue.bucketed)
+
+    def testUniformCostSearchWithExponentialCosts(self):
+        problem = WeightedCorridorProblem(20)
+        path = search.uniformCostSearch(problem)
+        self.assertEqual(path, ['East'] * 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,7 +29,9 @@
 import sys
 import inspect
 import heapq, random
+import collections
 import cStringIO
+import os
 
 
 class FixedRandom:
@@ -148,6 +150,9 @@ class Stack:
         "Returns true if the stack is empty"
         return len(self.list) == 0
 
+    def __len__(self):
+        return len(self.list)
+
 class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
     def __init__(self):
@@ -168,6 +173,9 @@ class Queue:
         "Returns true if the queue is empty"
         return len(self.list) == 0
 
+    def __len__(self):
+        return len(self.list)
+
 class PriorityQueue:
     """
       Implements a priority queue data structure. Each inserted item
@@ -191,6 +199,13 @@ class PriorityQueue:
     def isEmpty(self):
         return len(self.heap) == 0
 
+    def __len__(self):
+        return len(self.heap)
+
+    def peekPriority(self):
+        "Returns the lowest priority in the queue without popping its item"
+        return self.heap[0][0]
+
     def update(self, item, priority):
         # If item already in priority queue with higher priority, update its priority and rebuild the heap.
         # If item already in priority queue with equal or lower priority, do nothing.
@@ -206,6 +221,268 @@ class PriorityQueue:
         else:
             self.push(item, priority)
 
+class IndexedPriorityQueue:
+    """
+      A binary heap priority queue that holds at most one entry per key and
+      keeps a map from each key to its slot in the heap, so lowering the
+      priority of a queued item takes O(log n) instead of the linear scan
+      and heapify of PriorityQueue.update.  The key of an item is the item
+      itself unless a key function is given, e.g. one that maps search
+      nodes to their states.  Ties are broken first-in-first-out, and an
+      item whose priority is lowered counts as pushed at that moment.
+    """
+    def  __init__(self, key=None):
+        "key (item) -> hashable key identifying the item"
+        self.heap = []
+        self.position = {}
+        self.count = 0
+        self.key = key
+
+    def keyOf(self, item):
+        if self.key is None:
+            return item
+        return self.key(item)
+
+    def push(self, item, priority):
+        "Adds an item that is not queued yet"
+        key = self.keyOf(item)
+        if key in self.position:
+            raise ValueError, 'item is already in the queue; use update'
+        self.heap.append((priority, self.count, key, item))
+        self.count += 1
+        self.position[key] = len(self.heap) - 1
+        self._siftUp(len(self.heap) - 1)
+
+    def pop(self):
+        heap = self.heap
+        last = heap.pop()
+        if heap:
+            (_, _, key, item) = heap[0]
+            heap[0] = last
+            self.position[last[2]] = 0
+            self._siftDown(0)
+        else:
+            (_, _, key, item) = last
+        del self.position[key]
+        return item
+
+    def isEmpty(self):
+        return len(self.heap) == 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return self.keyOf(item) in self.position
+
+    def peekPriority(self):
+        "Returns the lowest priority in the queue without popping its item"
+        return self.heap[0][0]
+
+    def update(self, item, priority):
+        # If an item with the same key is queued with a higher priority, replace it and sift it up.
+        # If it is queued with an equal or lower priority, do nothing.
+        # If it is not queued, do the same thing as self.push.
+        key = self.keyOf(item)
+        index = self.position.get(key)
+        if index is None:
+            self.push(item, priority)
+        elif priority < self.heap[index][0]:
+            self.heap[index] = (priority, self.count, key, item)
+            self.count += 1
+            self._siftUp(index)
+
+    def _siftUp(self, index):
+        heap, position = self.heap, self.position
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if entry < heap[parent]:
+                heap[index] = heap[parent]
+                position[heap[index][2]] = index
+                index = parent
+            else:
+                break
+        heap[index] = entry
+        position[entry[2]] = index
+
+    def _siftDown(self, index):
+        heap, position = self.heap, self.position
+        size = len(heap)
+        entry = heap[index]
+        child = 2 * index + 1
+        while child < size:
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if heap[child] < entry:
+                heap[index] = heap[child]
+                position[heap[index][2]] = index
+                index = child
+                child = 2 * index + 1
+            else:
+                break
+        heap[index] = entry
+        position[entry[2]] = index
+
+class BucketPriorityQueue:
+    """
+      A bucketed (Dial) priority queue for small non-negative integer
+      priorities, such as path costs with unit or small integer step costs.
+      Items sit in one FIFO bucket per priority, so push and update are O(1)
+      and pop is O(1) amortized when priorities rarely go back down, as is
+      the case for uniform cost search and A* with a consistent heuristic.
+      Like IndexedPriorityQueue it holds at most one entry per key and an
+      item whose priority is lowered counts as pushed at that moment; the
+      entry it replaces stays in its old bucket and is skipped on pop.
+
+      There is one bucket for every integer up to the highest priority, so
+      only priorities at most maxSpread above the lowest one queued are
+      accepted: large step costs (such as StayWest's 2 ** x) would leave
+      thousands of empty buckets to allocate and walk past.
+    """
+    maxPriority = 100000
+    maxSpread = 256
+
+    def  __init__(self, key=None):
+        "key (item) -> hashable key identifying the item"
+        self.buckets = []
+        self.entries = {}
+        self.current = 0
+        self.count = 0
+        self.key = key
+
+    def keyOf(self, item):
+        if self.key is None:
+            return item
+        return self.key(item)
+
+    def accepts(self, priority):
+        "Returns true if 'priority' is an integer this queue can bucket"
+        return isinstance(priority, (int, long, float)) and 0 <= priority <= self.maxPriority \
+            and priority <= self.current + self.maxSpread and priority == int(priority)
+
+    def push(self, item, priority):
+        "Adds an item that is not queued yet"
+        key = self.keyOf(item)
+        if key in self.entries:
+            raise ValueError, 'item is already in the queue; use update'
+        self._insert(key, item, priority)
+
+    def _insert(self, key, item, priority):
+        if not self.accepts(priority):
+            raise ValueError, 'priority %r is not a small non-negative integer' % (priority,)
+        priority = int(priority)
+        while len(self.buckets) <= priority:
+            self.buckets.append(collections.deque())
+        self.buckets[priority].append((self.count, key, item))
+        self.entries[key] = (priority, self.count)
+        self.count += 1
+        if priority < self.current:
+            self.current = priority
+
+    def pop(self):
+        self._advance()
+        (_, key, item) = self.buckets[self.current].popleft()
+        del self.entries[key]
+        return item
+
+    def isEmpty(self):
+        return len(self.entries) == 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, item):
+        return self.keyOf(item) in self.entries
+
+    def peekPriority(self):
+        "Returns the lowest priority in the queue without popping its item"
+        self._advance()
+        return self.current
+
+    def update(self, item, priority):
+        # If an item with the same key is queued with a higher priority, queue it again in the lower bucket.
+        # If it is queued with an equal or lower priority, do nothing.
+        # If it is not queued, do the same thing as self.push.
+        key = self.keyOf(item)
+        entry = self.entries.get(key)
+        if entry is None or priority < entry[0]:
+            self._insert(key, item, priority)
+
+    def _advance(self):
+        # Move the current bucket up to the first one holding a live entry, dropping replaced entries
+        if not self.entries:
+            raise IndexError, 'pop from an empty priority queue'
+        entries = self.entries
+        while True:
+            bucket = self.buckets[self.current]
+            while bucket:
+                (count, key, _) = bucket[0]
+                entry = entries.get(key)
+                if entry is not None and entry[1] == count:
+                    return
+                bucket.popleft()
+            self.current += 1
+
+    def liveEntries(self):
+        "Returns the queued (priority, item) pairs in the order they would be popped"
+        result = []
+        for priority in range(self.current, len(self.buckets)):
+            for (count, key, item) in self.buckets[priority]:
+                entry = self.entries.get(key)
+                if entry is not None and entry[1] == count:
+                    result.append((priority, item))
+        return result
+
+class AdaptivePriorityQueue:
+    """
+      A priority queue that starts out as a BucketPriorityQueue and moves its
+      entries into an IndexedPriorityQueue the first time it is given a
+      priority that is not a small non-negative integer, or that lies more
+      than BucketPriorityQueue.maxSpread above the lowest one queued.
+      Problems with unit or small integer step costs (and integer
+      heuristics) get the bucket queue, everything else ends up on the heap,
+      and the order items come out in is the same either way.
+    """
+    def  __init__(self, key=None):
+        "key (item) -> hashable key identifying the item"
+        self.key = key
+        self.queue = BucketPriorityQueue(key)
+        self.bucketed = True
+
+    def _toHeap(self):
+        heap = IndexedPriorityQueue(self.key)
+        for (priority, item) in self.queue.liveEntries():
+            heap.push(item, priority)
+        self.queue = heap
+        self.bucketed = False
+
+    def push(self, item, priority):
+        if self.bucketed and not self.queue.accepts(priority):
+            self._toHeap()
+        self.queue.push(item, priority)
+
+    def update(self, item, priority):
+        if self.bucketed and not self.queue.accepts(priority):
+            self._toHeap()
+        self.queue.update(item, priority)
+
+    def pop(self):
+        return self.queue.pop()
+
+    def isEmpty(self):
+        return self.queue.isEmpty()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __contains__(self, item):
+        return item in self.queue
+
+    def peekPriority(self):
+        "Returns the lowest priority in the queue without popping its item"
+        return self.queue.peekPriority()
+
 class PriorityQueueWithFunction(PriorityQueue):
     """
     Implements a priority queue with the same push/pop signature of the
@@ -222,6 +499,72 @@ class PriorityQueueWithFunction(PriorityQueue):
         "Adds an item to the queue with priority from the priority function"
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
+class LRUCache:
+    """
+      A dictionary holding at most 'capacity' entries.  Once it is full,
+      storing a new key evicts the least recently stored or looked up one.
+      Handy for memoizing heuristics whose inputs repeat across a search.
+    """
+    def  __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        "Returns the value stored for key, marking it as recently used, or default"
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self.entries:
+            del self.entries[key]
+        elif len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = value
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def writeFileAtomically(path, write):
+    """
+      Calls write with a file opened for binary writing, then moves that file
+      to path in one step, so other processes never read a half written one.
+    """
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    out = open(temporary, 'wb')
+    try:
+        write(out)
+    finally:
+        out.close()
+    os.rename(temporary, path)
+
+def saveCacheFile(path, save):
+    """
+      Calls save(path) after creating the directory path is in.  Returns
+      whether it worked: a cache file that cannot be written only costs the
+      next process a rebuild, so IOError and OSError are not passed on.
+    """
+    try:
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        save(path)
+    except (IOError, OSError):
+        return False
+    return True
 
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"